@@ -0,0 +1,45 @@
+# Chunks embedded per second by each chat embedding backend, with an empty
+# cache and again with every chunk cached
+# Run from the repository root: python -m benchmarks.embeddings [chunks] [backend ...]
+# The openai backend needs OPENAI_API_KEY, local downloads its model once
+import os
+import sys
+import tempfile
+import time
+from chat import embeddings
+
+SENTENCES = [
+    'Receita líquida de vendas de mercadorias e prestação de serviços',
+    'Custo das mercadorias revendidas e dos serviços prestados',
+    'Despesas com vendas, gerais e administrativas do exercício',
+    'Resultado financeiro líquido e imposto de renda diferido',
+    'Caixa e equivalentes de caixa no final do exercício',
+]
+
+def synthetic_chunks(count):
+    return ([f'{SENTENCES[i % len(SENTENCES)]} nota {i}: R$ {i * 1371 % 99991} mil em 31/12/2022' for i in range(count)])
+
+def measure(backend, chunks):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = embeddings.EmbeddingCache(os.path.join(cache_dir, 'embeddings.sqlite'))
+        model = embeddings.CachedEmbedding(
+            embeddings.backend_model(backend), cache, embeddings.EMBED_BATCH_SIZE, embeddings.EMBED_WORKERS)
+        rates = []
+        for _ in ('cold', 'cached'):
+            start = time.perf_counter()
+            model.get_text_embedding_batch(chunks)
+            rates.append(len(chunks) / (time.perf_counter() - start))
+        return (rates)
+
+def main(count, backends):
+    chunks = synthetic_chunks(count)
+    print(f"{'backend':>8} {'chunks':>8} {'cold chunks/s':>14} {'cached chunks/s':>16}")
+    for backend in backends:
+        if backend == 'openai' and 'OPENAI_API_KEY' not in os.environ:
+            print(f'{backend:>8} skipped, OPENAI_API_KEY is not set')
+            continue
+        cold, cached = measure(backend, chunks)
+        print(f'{backend:>8} {count:>8,} {cold:>14,.0f} {cached:>16,.0f}')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, sys.argv[2:] or ['hash', 'local', 'openai'])
@@ -0,0 +1,60 @@
+# Peak memory and time of turning a query result into the sales frame:
+# fetchall() into pd.DataFrame against the chunked columnar reader
+# Run from the repository root: python -m benchmarks.fetch [rows ...]
+import sys
+import time
+import tracemalloc
+import pandas as pd
+from sales import columnar, schema
+from sales.incremental import ROW_COLUMNS
+from sales.schema import SALES_COLUMNS
+from benchmarks.schema import fetched_rows
+
+# Cursor over rows already received, like pinotdb after execute()
+class ResultCursor():
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.position = 0
+
+    def fetchall(self):
+        return (self.fetchmany(len(self.rows)))
+
+    def fetchmany(self, size):
+        rows = self.rows[self.position:self.position + size]
+        self.position += len(rows)
+        return (rows)
+
+def fetchall_frame(curs, columns):
+    return (schema.apply(pd.DataFrame(curs.fetchall(), columns=columns)))
+
+def columnar_frame(curs, columns):
+    return (columnar.read_frame(curs, columns, 10000))
+
+def measure(build, rows, columns):
+    curs = ResultCursor(rows)
+    tracemalloc.start()
+    start = time.perf_counter()
+    sales_df = build(curs, columns)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (elapsed * 1000, peak / 2**20, sales_df.memory_usage(deep=True).sum() / 2**20)
+
+def main(sizes):
+    print(f"{'rows':>10} {'path':>22} {'ms':>9} {'peak MB':>9} {'frame MB':>9}")
+    for size in sizes:
+        all_rows = fetched_rows(size)
+        # Same rows with only the projected columns, as the projected SELECT returns them
+        positions = [SALES_COLUMNS.index(c) for c in ROW_COLUMNS]
+        projected_rows = [tuple(row[i] for i in positions) for row in all_rows]
+        for path, build, rows, columns in [
+            ('fetchall, all columns', fetchall_frame, all_rows, SALES_COLUMNS),
+            ('columnar, all columns', columnar_frame, all_rows, SALES_COLUMNS),
+            ('columnar, projected', columnar_frame, projected_rows, ROW_COLUMNS),
+        ]:
+            elapsed, peak, frame = measure(build, rows, columns)
+            print(f'{size:>10,} {path:>22} {elapsed:>9.1f} {peak:>9.1f} {frame:>9.1f}')
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or [100000, 1000000])
@@ -0,0 +1,113 @@
+# Synthetic transactions at any scale, drawn from the distributions of
+# data/shopping_trends_updated.csv: every column follows its share in the
+# file, and the columns that depend on another one (category on item,
+# subscription on gender, discount on subscription, promo code on discount)
+# follow their share given that column
+# Run from the repository root: python -m benchmarks.generate rows output [seed]
+# An output ending in .json gets JSON lines, as the Pinot ingestion reads
+# them; anything else is a directory of Parquet parts for SALES_LOCAL_FILES
+import os
+import sys
+import duckdb
+import numpy as np
+import pandas as pd
+from sales.schema import SALES_COLUMNS
+
+CSV = './data/shopping_trends_updated.csv'
+
+# Column: the column it is drawn given
+DEPENDS_ON = {
+    'category': 'item_purchased',
+    'subscription_status': 'gender',
+    'discount_applied': 'subscription_status',
+    'promo_code_used': 'discount_applied',
+}
+
+# Purchase times spread over the months of the batch file
+FIRST_TIME = 1677628800000
+TIME_SPAN = 275 * 24 * 3600 * 1000
+
+CHUNK_ROWS = 1000000
+
+def read_csv(path=CSV):
+    csv_df = pd.read_csv(path)
+    csv_df.columns = [c.lower().replace(' ', '_').replace('(', '').replace(')', '') for c in csv_df.columns]
+    return (csv_df)
+
+# Shares of every column of the file, given its parent for the dependent ones
+class ShoppingModel():
+
+    def __init__(self, csv_df):
+        self.values = {}
+        self.shares = {}
+        self.conditional = {}
+        for column in SALES_COLUMNS:
+            if column in ('customer_id', 'purchase_time'):
+                continue
+            shares = csv_df[column].value_counts(normalize=True).sort_index()
+            self.values[column] = shares.index.to_numpy()
+            self.shares[column] = shares.to_numpy()
+        for column, parent in DEPENDS_ON.items():
+            table = pd.crosstab(csv_df[parent], csv_df[column], normalize='index')
+            table = table.reindex(index=self.values[parent], columns=self.values[column], fill_value=0)
+            self.conditional[column] = np.cumsum(table.to_numpy(), axis=1)
+
+    @classmethod
+    def fit(cls, path=CSV):
+        return (cls(read_csv(path)))
+
+    # Positions into values[column] for rows rows
+    def draw(self, rng, column, codes, rows):
+        if column not in DEPENDS_ON:
+            return (rng.choice(len(self.values[column]), size=rows, p=self.shares[column]))
+        cumulative = self.conditional[column][codes[DEPENDS_ON[column]]]
+        drawn = (cumulative < rng.random(rows)[:, None]).sum(axis=1)
+        return (np.minimum(drawn, cumulative.shape[1] - 1))
+
+    # Strings as categoricals, a fraction of the memory of Python strings
+    def column(self, column, codes):
+        values = self.values[column]
+        if values.dtype == object:
+            return (pd.Categorical.from_codes(codes, categories=values))
+        return (values[codes])
+
+    # rows transactions with customer ids from first_id, purchase times
+    # increasing with them, step milliseconds apart
+    def sample(self, rng, rows, first_id=1, step=1000):
+        codes = {}
+        for column in self.values:
+            if column not in DEPENDS_ON:
+                codes[column] = self.draw(rng, column, codes, rows)
+        # In DEPENDS_ON order, so every parent is drawn before its column
+        for column in DEPENDS_ON:
+            codes[column] = self.draw(rng, column, codes, rows)
+        sample_df = pd.DataFrame({column: self.column(column, codes[column]) for column in self.values})
+        ids = np.arange(first_id, first_id + rows)
+        sample_df['customer_id'] = ids
+        sample_df['purchase_time'] = FIRST_TIME + ids * step
+        return (sample_df[SALES_COLUMNS])
+
+# Chunks of the synthetic table, CHUNK_ROWS rows at a time
+def chunks(rows, seed=0, chunk_rows=CHUNK_ROWS, model=None):
+    model = model or ShoppingModel.fit()
+    rng = np.random.default_rng(seed)
+    step = max(1, TIME_SPAN // max(rows, 1))
+    for first in range(0, rows, chunk_rows):
+        yield (model.sample(rng, min(chunk_rows, rows - first), first + 1, step))
+
+def write(rows, output, seed=0, chunk_rows=CHUNK_ROWS):
+    if output.endswith('.json'):
+        with open(output, 'w') as f:
+            for chunk_df in chunks(rows, seed, chunk_rows):
+                f.write(chunk_df.to_json(orient='records', lines=True))
+        return
+    os.makedirs(output, exist_ok=True)
+    conn = duckdb.connect()
+    for n, chunk_df in enumerate(chunks(rows, seed, chunk_rows)):
+        conn.register('chunk_df', chunk_df)
+        conn.execute(f"COPY chunk_df TO '{os.path.join(output, f'part-{n:05d}.parquet')}' (FORMAT PARQUET)")
+        conn.unregister('chunk_df')
+    conn.close()
+
+if __name__ == '__main__':
+    write(int(sys.argv[1]), sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 0)
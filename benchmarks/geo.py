@@ -0,0 +1,53 @@
+# Sales page map: the module imports a fresh process pays for, with the old
+# import list against the current one, and the rerun cost of the state
+# revenue, with the per-rerun read_json and merge against the geo layer
+# Run from the repository root: python -m benchmarks.geo [repeat]
+import subprocess
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+from sales import geo
+
+OLD_IMPORTS = 'import streamlit, pandas, geopandas, numpy, matplotlib.pyplot, plotly.express, branca, folium, shapely.geometry, plotly.graph_objects, streamlit_folium'
+NEW_IMPORTS = 'import streamlit, plotly.express, plotly.graph_objects, sales.geo'
+
+# Seconds to import the modules in a new interpreter, None when one of them
+# is not installed
+def cold_import(statement):
+    code = f'import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    return (float(result.stdout) if result.returncode == 0 else None)
+
+# revenue_by_state as the aggregation returns it: one row per location
+def state_sales(seed=0):
+    names, _ = geo.states()
+    rng = np.random.default_rng(seed)
+    return (pd.DataFrame({
+        'location': pd.Categorical(names[rng.permutation(len(names))][:50]),
+        'purchase_amount_usd': rng.integers(1000, 5000, 50).astype(np.float64),
+    }))
+
+# What the page did before on every rerun
+def merged(sales_location):
+    us_states_df = pd.read_json(geo.STATES_FILE)
+    us_states_df = us_states_df.rename(columns={'name':'location'})
+    sales_location = pd.merge(sales_location, us_states_df ,how='left', on='location')
+    sales_location = sales_location.groupby(["abbreviation"])['purchase_amount_usd'].sum().reset_index()
+    return (sales_location, sales_location.groupby(["abbreviation"])['purchase_amount_usd'].sum())
+
+def main(repeat):
+    print(f"{'cold imports':>14} {'seconds':>8}")
+    for name, statement in [('old', OLD_IMPORTS), ('new', NEW_IMPORTS)]:
+        seconds = cold_import(statement)
+        print(f"{name:>14} {'not installed' if seconds is None else f'{seconds:>8.2f}'}")
+    sales_location = state_sales()
+    geo.states()
+    old = min(timeit.repeat(lambda: merged(sales_location), number=1, repeat=repeat))
+    new = min(timeit.repeat(lambda: geo.revenue_by_state(sales_location), number=1, repeat=repeat))
+    print(f"{'rerun':>14} {'ms':>8}")
+    print(f"{'merge':>14} {old * 1000:>8.2f}")
+    print(f"{'geo layer':>14} {new * 1000:>8.2f}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,31 @@
+# Chunks and embedded tokens of the balance sheet with flat text splitting
+# and with structure-aware ingestion, and the time to parse it
+# Run from the repository root: python -m benchmarks.ingestion [chunk_size] [workers ...]
+import os
+import sys
+import time
+from llama_index import SimpleDirectoryReader
+from llama_index.node_parser import SimpleNodeParser
+from llama_index.schema import MetadataMode
+from llama_index.utils import get_tokenizer
+from chat import ingestion
+
+PDF = './magalu/MAGALU_BAL_FIN_2022.pdf'
+
+def report(name, seconds, nodes):
+    tokens = sum(len(get_tokenizer()(node.get_content(metadata_mode=MetadataMode.EMBED))) for node in nodes)
+    print(f'{name:>22} {seconds:>8.1f} {len(nodes):>7} {tokens:>10,}')
+
+def main(chunk_size, workers):
+    print(f"{'ingestion':>22} {'seconds':>8} {'chunks':>7} {'tokens':>10}")
+    start = time.perf_counter()
+    docs = SimpleDirectoryReader(input_files=[PDF], filename_as_id=True).load_data()
+    nodes = SimpleNodeParser.from_defaults(chunk_size=chunk_size).get_nodes_from_documents(docs)
+    report('simple', time.perf_counter() - start, nodes)
+    for count in workers:
+        start = time.perf_counter()
+        nodes = ingestion.pdf_nodes(PDF, os.path.basename(PDF), chunk_size, workers=count)
+        report(f'structured, {count} procs', time.perf_counter() - start, nodes)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 512, [int(w) for w in sys.argv[2:]] or [1, os.cpu_count() or 1])
@@ -0,0 +1,78 @@
+# Insights page aggregations: per-row age mapping with five groupbys against
+# what the page runs now, the per-age aggregate computed by the engine (the
+# page's SQL on DuckDB here), then the cube and its three marginals
+# Run from the repository root: python -m benchmarks.insights [rows ...]
+import sys
+import timeit
+import duckdb
+import numpy as np
+import pandas as pd
+from sales import queries, schema
+from sales.insights import InsightsCube
+from sales.schema import PAY_METHODS, PRODUCT_ITEMS
+
+frequencies = ['Weekly','Fortnightly','Bi-Weekly','Monthly','Quarterly','Every 3 Months','Annually']
+
+def synthetic_rows(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return (pd.DataFrame({
+        'customer_id': np.arange(rows),
+        'age': rng.integers(18, 71, rows),
+        'payment_method': rng.choice(PAY_METHODS, rows),
+        'frequency_of_purchases': rng.choice(frequencies, rows),
+        'item_purchased': rng.choice(PRODUCT_ITEMS[:10], rows),
+        'purchase_amount_usd': rng.integers(20, 101, rows),
+    }))
+
+def set_age_bin(age):
+    if age < 30:
+        return('twenties')
+    elif age < 40:
+        return('thirties')
+    elif age < 50:
+        return('forties')
+    else:
+        return('senior')
+
+# What the page did before: one map over the rows and five groupbys
+def per_row(insights_df):
+    insights_df.groupby(['item_purchased'])[['customer_id']].agg("count").reset_index()
+    insights_df.groupby(['item_purchased'])[['purchase_amount_usd']].agg("sum").reset_index()
+    insight_df = insights_df[['age','payment_method','frequency_of_purchases','customer_id']].copy()
+    insight_df['age_range'] = insight_df['age'].map(set_age_bin)
+    insight_df = insight_df.drop(columns=['age'])
+    insight_df.groupby(['age_range','payment_method']).agg("count").reset_index()
+    insight_df.groupby(['age_range','frequency_of_purchases']).agg("count").reset_index()
+    insight_df.groupby(['frequency_of_purchases','payment_method']).agg("count").reset_index()
+
+# The engine's part: the GROUP BY the page sends, on the same rows
+def per_age(conn):
+    name = 'customers_by_age_payment_frequency'
+    sql, params = queries.aggregate_sql(name)
+    group_by, _ = queries.AGGREGATIONS[name]
+    cube_df = conn.execute(sql, params).df()
+    return (schema.apply(cube_df, group_by))
+
+# The page's part, as pages/3 runs it
+def cube(cube_df):
+    insights_cube = InsightsCube(cube_df)
+    insights_cube.marginal(['age_range','payment_method'])
+    insights_cube.marginal(['age_range','frequency_of_purchases'])
+    insights_cube.marginal(['frequency_of_purchases','payment_method'])
+
+def main(sizes):
+    print(f"{'rows':>12} {'per row (ms)':>14} {'aggregate (ms)':>15} {'cube (ms)':>10} {'groups':>7}")
+    for rows in sizes:
+        insights_df = synthetic_rows(rows)
+        conn = duckdb.connect()
+        conn.register(queries.TABLE, insights_df)
+        repeat = 3
+        old = min(timeit.repeat(lambda: per_row(insights_df), number=1, repeat=repeat))
+        aggregate = min(timeit.repeat(lambda: per_age(conn), number=1, repeat=repeat))
+        cube_df = per_age(conn)
+        new = min(timeit.repeat(lambda: cube(cube_df), number=1, repeat=repeat))
+        print(f'{rows:>12,} {old * 1000:>14.1f} {aggregate * 1000:>15.1f} {new * 1000:>10.1f} {len(cube_df):>7,}')
+        conn.close()
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or [4000, 100000, 1000000])
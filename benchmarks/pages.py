@@ -0,0 +1,173 @@
+# Data pipeline of the product, sales and insights pages run headlessly on
+# synthetic tables of several sizes: the load of the data source, then each
+# page with its default selection and again with a narrower one (filter,
+# aggregate, figure build), with time and peak Python memory per step and
+# the peak resident size of the process
+# Run from the repository root: python -m benchmarks.pages [--sizes N ...] [--mode exact] [--save F] [--baseline F]
+# Each size runs in a fresh process on the embedded backend; with --baseline
+# the run fails when a step is slower than the saved one by more than
+# --tolerance, as a regression gate
+import argparse
+import json
+import locale
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from sales.schema import PRODUCT_ITEMS, PAY_METHODS, SEASONS, currency
+
+# Default selection of each page, then a narrower one
+SELECTIONS = {
+    'product': [{'item_purchased': PRODUCT_ITEMS}, {'item_purchased': PRODUCT_ITEMS[:5]}],
+    'sales': [{'item_purchased': PRODUCT_ITEMS}, {'item_purchased': PRODUCT_ITEMS[5:]}],
+    'insights': [
+        {'payment_method': PAY_METHODS, 'season': SEASONS},
+        {'payment_method': PAY_METHODS[:3], 'season': SEASONS[2:]},
+    ],
+}
+
+# Figures are built when plotly is installed, the pages' own charts
+try:
+    import plotly.express as px
+except ImportError:
+    px = None
+
+def bar(df, x, y, **kwargs):
+    if px is not None:
+        px.bar(df, x=x, y=y, **kwargs)
+
+def product(source, filters):
+    kpis = source.aggregate('kpis', filters)
+    currency(kpis['total_revenue'].sum())
+    bar(source.aggregate('revenue_by_item', filters), 'item_purchased', 'purchase_amount_usd')
+    bar(source.aggregate('revenue_by_category', filters), 'purchase_amount_usd', 'category', orientation='h')
+    table_df = source.aggregate('customers_revenue_by_category_item', filters)
+    table_df['sum_rev'].map(currency)
+
+def sales(source, filters):
+    from sales import geo, histogram
+    for name, column in [('customers_by_size', 'size'), ('customers_by_gender', 'gender'),
+            ('customers_by_promo_code', 'promo_code_used'), ('customers_by_shipping_type', 'shipping_type')]:
+        bar(source.aggregate(name, filters), column, 'customer_id')
+    geo.revenue_by_state(source.aggregate('revenue_by_state', filters))
+    age_bins = histogram.binned(source.aggregate('customers_by_age', filters), 'age', 'customers')
+    bar(age_bins, 'center', 'customers')
+
+def insights(source, filters):
+    from sales.insights import InsightsCube
+    bar(source.aggregate('purchases_by_payment_method', filters), 'payment_method', 'purchases')
+    bar(source.aggregate('revenue_by_season', filters), 'season', 'purchase_amount_usd')
+    bar(source.aggregate('purchases_revenue_by_item', filters), 'item_purchased', 'purchase_amount_usd')
+    insights_cube = InsightsCube(source.aggregate('customers_by_age_payment_frequency', filters))
+    for dimensions in (['age_range', 'payment_method'], ['age_range', 'frequency_of_purchases'],
+            ['frequency_of_purchases', 'payment_method']):
+        bar(insights_cube.marginal(dimensions), dimensions[0], 'customers', color=dimensions[1])
+
+PAGES = {'product': product, 'sales': sales, 'insights': insights}
+
+# Milliseconds and peak traced MB of one call; traced separately, as
+# tracemalloc slows down what it traces
+def measure(step):
+    start = time.perf_counter()
+    step()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    step()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ({'ms': round(elapsed * 1000, 2), 'peak_mb': round(peak / 2**20, 2)})
+
+# One size, in this process: the environment already points the embedded
+# backend at the synthetic table
+def run(mode):
+    try:
+        locale.setlocale(locale.LC_ALL, 'en_CA.UTF-8')
+    except locale.Error:
+        pass
+    from sales import access
+    results = {}
+    start = time.perf_counter()
+    source = access.source(mode)
+    source.version()
+    results['load'] = {'ms': round((time.perf_counter() - start) * 1000, 2)}
+    for name, page in PAGES.items():
+        default, narrow = SELECTIONS[name]
+        results[f'{name}'] = measure(lambda: page(source, default))
+        results[f'{name}, filtered'] = measure(lambda: page(source, narrow))
+    results['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return (results)
+
+def benchmark(rows, mode, data_dir):
+    from benchmarks import generate
+    table = os.path.join(data_dir, f'rows-{rows}')
+    start = time.perf_counter()
+    if not os.path.isdir(table):
+        generate.write(rows, table)
+    generated = time.perf_counter() - start
+    env = dict(os.environ, SALES_BACKEND='embedded', SALES_LOCAL_FILES=table,
+        SALES_PARQUET_DIR=os.path.join(data_dir, f'engine-{rows}'), DIAGNOSTICS='')
+    child = subprocess.run([sys.executable, '-m', 'benchmarks.pages', '--run', '--mode', mode],
+        env=env, capture_output=True, text=True, check=True)
+    results = json.loads(child.stdout)
+    results['generate'] = {'ms': round(generated * 1000, 2)}
+    return (results)
+
+def report(all_results):
+    steps = [step for step in next(iter(all_results.values())) if step not in ('max_rss_mb', 'generate')]
+    print(f"{'step':>20} " + ' '.join(f'{f"{int(rows):,} rows":>22}' for rows in all_results))
+    for step in steps:
+        cells = []
+        for results in all_results.values():
+            result = results[step]
+            peak = f" {result['peak_mb']:>6.1f}MB" if 'peak_mb' in result else ' ' * 9
+            cells.append(f"{result['ms']:>11.1f}ms{peak}")
+        print(f'{step:>20} ' + ' '.join(cells))
+    print(f"{'max RSS':>20} " + ' '.join(f"{results['max_rss_mb']:>20.1f}MB" for results in all_results.values()))
+
+# Steps slower than the baseline by more than tolerance, ignoring those
+# under a few milliseconds where timer noise dominates
+def regressions(all_results, baseline, tolerance, floor_ms=5):
+    slower = []
+    for rows, results in all_results.items():
+        for step, result in results.items():
+            before = baseline.get(rows, {}).get(step)
+            if not isinstance(result, dict) or step == 'generate' or not before:
+                continue
+            if result['ms'] > floor_ms and result['ms'] > before['ms'] * (1 + tolerance):
+                slower.append(f"{int(rows):,} rows, {step}: {before['ms']:.1f}ms -> {result['ms']:.1f}ms")
+    return (slower)
+
+def main(args):
+    if args.run:
+        print(json.dumps(run(args.mode)))
+        return
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = args.data_dir or scratch
+        all_results = {str(rows): benchmark(rows, args.mode, data_dir) for rows in args.sizes}
+    report(all_results)
+    if px is None:
+        print('plotly is not installed, figures were not built')
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(all_results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(all_results, json.load(f), args.tolerance)
+        for line in slower:
+            print(f'slower: {line}')
+        if slower:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless benchmark of the dashboard pages')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 10000000])
+    parser.add_argument('--mode', default='exact', help='data access mode, see sales/access.py')
+    parser.add_argument('--data-dir', help='keep the synthetic tables here between runs')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='fail when slower than the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -0,0 +1,207 @@
+# Replays the online events as a live stream and measures their freshness:
+# each event is stamped with purchase_time when it is produced, sent at a
+# fixed rate (or as fast as the sink takes them) and watched for until it
+# shows up in Pinot and in the exact aggregates the dashboards read
+# Run from the repository root: python -m benchmarks.replay [--rate N] [--count N] [--sink kafka|embedded|memory]
+# kafka needs kafka-python and a broker feeding the SalesTxs realtime table;
+# embedded needs SALES_BACKEND=embedded and appends the events to the local
+# DuckDB table every --consume seconds, as Pinot consumes its topic, so the
+# whole path is measured on one machine; memory keeps the events in this
+# process, to measure the producer alone
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+EVENTS_FILE = './data/shopping_trends_updated_online.json'
+
+KAFKA_BOOTSTRAP = os.environ.get('SALES_KAFKA_BOOTSTRAP', 'localhost:9092')
+KAFKA_TOPIC = os.environ.get('SALES_KAFKA_TOPIC', 'sales_txs')
+
+def read_events(path=EVENTS_FILE):
+    with open(path) as f:
+        return ([json.loads(line) for line in f if line.strip()])
+
+# count events from the file, looping over it with new customer ids once it
+# runs out
+def replayed(events, count):
+    last_id = max(event['customer_id'] for event in events)
+    for n in range(count):
+        event = dict(events[n % len(events)])
+        event['customer_id'] += (n // len(events)) * last_id
+        yield (event)
+
+class KafkaSink():
+
+    def __init__(self, bootstrap=KAFKA_BOOTSTRAP, topic=KAFKA_TOPIC):
+        from kafka import KafkaProducer
+        self.topic = topic
+        self.producer = KafkaProducer(
+            bootstrap_servers=bootstrap,
+            value_serializer=lambda event: json.dumps(event).encode('utf-8')
+        )
+
+    def send(self, event):
+        self.producer.send(self.topic, event)
+
+    def flush(self):
+        self.producer.flush()
+
+# In-process stand-in for a topic
+class MemorySink():
+
+    def __init__(self):
+        self.events = deque()
+
+    def send(self, event):
+        self.events.append(event)
+
+    def flush(self):
+        pass
+
+# Local stand-in for the topic and the realtime table: a consumer thread
+# appends what was sent to the embedded backend every interval seconds
+class EmbeddedSink():
+
+    def __init__(self, interval):
+        from sales import config, embedded
+        if config.BACKEND != 'embedded':
+            raise SystemExit('the embedded sink needs SALES_BACKEND=embedded')
+        self.database = embedded.database
+        self.interval = interval
+        self.pending = deque()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def send(self, event):
+        self.pending.append(event)
+
+    def consume(self):
+        batch = []
+        while self.pending:
+            batch.append(self.pending.popleft())
+        if batch:
+            self.database.append(batch)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.consume()
+
+    # Sent means handed to the topic, as with Kafka: consumption goes on
+    def flush(self):
+        pass
+
+SINKS = {
+    'kafka': lambda args: KafkaSink(),
+    'embedded': lambda args: EmbeddedSink(args.consume),
+    'memory': lambda args: MemorySink(),
+}
+
+# Sends the events at rate per second, 0 meaning no pacing, each stamped
+# with the time it is sent. The schedule is kept against the start time, so
+# a late send is caught up on, not carried
+def produce(sink, events, rate, sent):
+    start = time.perf_counter()
+    for n, event in enumerate(events):
+        if rate:
+            delay = start + n / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        event['purchase_time'] = int(time.time() * 1000)
+        sink.send(event)
+        sent.append(time.perf_counter())
+    sink.flush()
+    return (time.perf_counter() - start)
+
+# Events of this run visible to the broker, and to the dashboards through the
+# exact aggregates with their result cache
+def broker_count(since_ms):
+    from sales import pinot
+    from sales.queries import TABLE
+    count_df = pinot.fetch(
+        f'SELECT COUNT(*) AS "events" FROM {TABLE} WHERE "purchase_time" >= %(since)s',
+        {'since': since_ms},
+        ['events']
+    )
+    return (int(count_df.iloc[0, 0]))
+
+def dashboard_count():
+    from sales import access
+    return (int(access.exact.aggregate('kpis')['total_customers'].iloc[0]))
+
+# Polls the counts every interval seconds. Events arrive in order, so when a
+# count goes from a to b the events a to b-1 have just become visible
+class FreshnessWatch():
+
+    def __init__(self, sent, counters, interval):
+        self.sent = sent
+        self.counters = counters
+        self.interval = interval
+        self.seen = {name: 0 for name in counters}
+        self.lags = {name: [] for name in counters}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def poll(self):
+        for name, count in self.counters.items():
+            now = time.perf_counter()
+            visible = min(count(), len(self.sent))
+            self.lags[name].extend(now - self.sent[n] for n in range(self.seen[name], visible))
+            self.seen[name] = max(self.seen[name], visible)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.poll()
+
+    # Keeps polling after the last send until everything showed up or settle
+    # seconds went by
+    def finish(self, total, settle):
+        deadline = time.perf_counter() + settle
+        while time.perf_counter() < deadline and min(self.seen.values()) < total:
+            time.sleep(self.interval)
+        self.stopped.set()
+        self.thread.join()
+        self.poll()
+
+def report(name, lags, total):
+    if not lags:
+        print(f'{name:>10} {0:>6}/{total:<6} {"-":>9} {"-":>9} {"-":>9}')
+        return
+    p50, p95, worst = np.percentile(lags, [50, 95, 100])
+    print(f'{name:>10} {len(lags):>6}/{total:<6} {p50:>9.2f} {p95:>9.2f} {worst:>9.2f}')
+
+def main(args):
+    sink = SINKS[args.sink](args)
+    sent = []
+    events = replayed(read_events(), args.count)
+    watch = None
+    if args.sink != 'memory':
+        since_ms = int(time.time() * 1000)
+        baseline = dashboard_count()
+        watch = FreshnessWatch(sent, {
+            'broker': lambda: broker_count(since_ms),
+            'dashboard': lambda: dashboard_count() - baseline,
+        }, args.poll)
+        watch.thread.start()
+    elapsed = produce(sink, events, args.rate, sent)
+    print(f'{len(sent)} events in {elapsed:.2f}s, {len(sent) / elapsed:,.0f} events/s to {args.sink}')
+    if watch is None:
+        return
+    watch.finish(len(sent), args.settle)
+    print(f"{'freshness':>10} {'seen':>13} {'p50 (s)':>9} {'p95 (s)':>9} {'max (s)':>9}")
+    for name, lags in watch.lags.items():
+        report(name, lags, len(sent))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay the online events and measure their freshness')
+    parser.add_argument('--rate', type=float, default=50, help='events per second, 0 for as fast as possible')
+    parser.add_argument('--count', type=int, default=399, help='events to send, looping over the file')
+    parser.add_argument('--sink', choices=list(SINKS), default='kafka')
+    parser.add_argument('--poll', type=float, default=0.25, help='seconds between freshness queries')
+    parser.add_argument('--settle', type=float, default=120, help='seconds to wait for the last events')
+    parser.add_argument('--consume', type=float, default=0.5, help='seconds between appends of the embedded sink')
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+# Offline retrieval quality and latency of the chat_plus pipelines on a fixed
+# question set: a question counts as answered when a chunk handed to the LLM
+# contains its expected passage
+# Run from the repository root: python -m benchmarks.retrieval [backend] [scorer]
+# Uses the hash embedding backend by default, so no API key is needed
+import sys
+import tempfile
+import time
+import numpy as np
+from llama_index.llms import MockLLM
+from chat import embeddings, index_store, retrieval
+from chat.answer_cache import normalize
+
+# (question, passage expected in the retrieved chunks)
+QUESTIONS = [
+    ('Quais são as debêntures emitidas pela Companhia?', 'debêntures'),
+    ('Qual a provisão para demandas judiciais tributárias?', 'demandas judiciais tributárias'),
+    ('Como foi a aquisição da Kabum?', 'kabum'),
+    ('Quais as transações com a Luizacred?', 'luizacred'),
+    ('Qual o saldo de caixa e equivalentes de caixa?', 'caixa e equivalentes de caixa'),
+    ('Qual a receita líquida de vendas?', 'receita líquida'),
+    ('Qual o impacto da pandemia de Covid-19?', 'covid'),
+    ('Quem auditou as demonstrações financeiras de 2021?', 'outro auditor independente'),
+    ('Quais deficiências nos controles de acesso foram identificadas?', 'deficiências nos controles'),
+    ('Como são tratados os arrendamentos?', 'arrendamento'),
+    ('O que são as transações com a PJD Agropastoril?', 'pjd agropastoril'),
+    ('Qual o capital social da Companhia?', 'capital social'),
+    ('O imposto de renda e contribuição social diferidos são recuperáveis?', 'imposto de renda e contribuição social diferidos'),
+    ('Quais fundos de investimentos exclusivos a Companhia possui?', 'fundos de investimentos exclusivos'),
+    ('Qual a remuneração do pessoal-chave da administração?', 'remuneração'),
+    ('Qual a participação na Netshoes?', 'netshoes'),
+]
+
+def answered(nodes, passage):
+    return (any(normalize(passage) in normalize(retrieval.node_text(node.node)) for node in nodes))
+
+def evaluate(name, retrieve):
+    hits = 0
+    seconds = []
+    for question, passage in QUESTIONS:
+        start = time.perf_counter()
+        nodes = retrieve(question)
+        seconds.append(time.perf_counter() - start)
+        hits += answered(nodes, passage)
+    print(f'{name:>24} {hits:>4}/{len(QUESTIONS)} {np.mean(seconds) * 1000:>10.1f}')
+
+def main(backend, scorer_name):
+    with tempfile.TemporaryDirectory() as storage:
+        index_store.INDEX_ROOT = storage
+        index = index_store.load_or_build(
+            'eval', './magalu', llm=MockLLM(), chunk_size=512, embed_model=embeddings.embed_model(backend))
+        keyword_index = retrieval.BM25Index.from_index(index)
+        vector = index.as_retriever(similarity_top_k=10)
+        hybrid = retrieval.HybridRetriever(index, keyword_index, top_k=10)
+        reranker = retrieval.LocalRerank(retrieval.scorer(keyword_index, scorer_name), top_n=2)
+        print(f'{len(keyword_index.nodes)} chunks, {backend} embeddings, {scorer_name} reranker')
+        print(f"{'pipeline':>24} {'answered':>9} {'ms/query':>10}")
+        evaluate('vector top 2', lambda q: vector.retrieve(q)[:2])
+        evaluate('bm25 top 2', lambda q: keyword_index.search(q, 2))
+        evaluate('hybrid top 2', lambda q: hybrid.retrieve(q)[:2])
+        evaluate('vector 10 + rerank 2', lambda q: reranker.postprocess_nodes(vector.retrieve(q), query_str=q))
+        evaluate('hybrid 10 + rerank 2', lambda q: reranker.postprocess_nodes(hybrid.retrieve(q), query_str=q))
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'hash', sys.argv[2] if len(sys.argv) > 2 else 'lexical')
@@ -0,0 +1,40 @@
+# Memory and groupby throughput of the sales frame as built from fetchall()
+# rows, against the same rows typed with sales.schema
+# Run from the repository root: python -m benchmarks.schema [rows ...]
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+from sales import schema
+from sales.schema import SALES_COLUMNS
+
+# Rows of data/shopping_trends_updated.csv repeated up to the requested size,
+# as the list of tuples pinotdb returns
+def fetched_rows(rows):
+    csv_df = pd.read_csv('./data/shopping_trends_updated.csv')
+    csv_df.columns = [c.lower().replace(' ', '_').replace('(', '').replace(')', '') for c in csv_df.columns]
+    csv_df['purchase_time'] = 1701388800000 + csv_df['customer_id'] * 60000
+    csv_df = csv_df[SALES_COLUMNS]
+    tiled_df = csv_df.iloc[np.arange(rows) % len(csv_df)]
+    return (list(tiled_df.itertuples(index=False, name=None)))
+
+def groupbys(sales_df):
+    sales_df.groupby('item_purchased', observed=True)['purchase_amount_usd'].sum()
+    sales_df.groupby(['category', 'item_purchased'], observed=True)['customer_id'].count()
+    sales_df.groupby('size', observed=True)['customer_id'].count()
+    sales_df.groupby('location', observed=True)['purchase_amount_usd'].sum()
+
+def main(sizes):
+    print(f"{'rows':>12} {'plain MB':>10} {'typed MB':>10} {'plain groupby ms':>17} {'typed groupby ms':>17}")
+    for rows in sizes:
+        fetched = fetched_rows(rows)
+        plain_df = pd.DataFrame(fetched, columns=SALES_COLUMNS)
+        typed_df = schema.build_frame(fetched, SALES_COLUMNS)
+        plain_mb = plain_df.memory_usage(deep=True).sum() / 2**20
+        typed_mb = typed_df.memory_usage(deep=True).sum() / 2**20
+        plain_ms = min(timeit.repeat(lambda: groupbys(plain_df), number=1, repeat=3)) * 1000
+        typed_ms = min(timeit.repeat(lambda: groupbys(typed_df), number=1, repeat=3)) * 1000
+        print(f'{rows:>12,} {plain_mb:>10.1f} {typed_mb:>10.1f} {plain_ms:>17.1f} {typed_ms:>17.1f}')
+
+if __name__ == '__main__':
+    main([int(n) for n in sys.argv[1:]] or [4000, 100000, 1000000])
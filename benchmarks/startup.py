@@ -0,0 +1,129 @@
+# Cold start of every page: the time its imports take in a fresh process
+# that already has streamlit loaded, as the server has, then the time from
+# the start of its first run until the first element is sent to the browser
+# (first paint) and until the run ends, and a warm rerun for comparison
+# Run from the repository root: python -m benchmarks.startup [--pages P ...] [--repeat N] [--save F]
+# Every measure is taken in new processes, through streamlit's AppTest, and
+# the median of --repeat runs is reported. The dashboard pages read the
+# embedded backend unless SALES_BACKEND says otherwise; the chat pages need
+# OPENAI_API_KEY and build their index on the first run when ./storage has none
+import argparse
+import ast
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PAGES = ['home.py'] + sorted(glob.glob('pages/*.py'))
+
+# Seconds a page run may take, building a chat index included
+TIMEOUT = 600
+
+# The import statements at the top level of a page, lazy imports as written
+def page_imports(path):
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return ([ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))])
+
+# Milliseconds to run the page's imports and the modules they load
+def imports(path):
+    import streamlit
+    sys.path.insert(0, os.getcwd())
+    loaded = len(sys.modules)
+    start = time.perf_counter()
+    exec('\n'.join(page_imports(path)), {})
+    return ({'imports_ms': round((time.perf_counter() - start) * 1000, 1), 'modules': len(sys.modules) - loaded})
+
+# Milliseconds from the start of the page script to its first element and
+# to its end, on a first and a second run. AppTest sets up a runtime for
+# every app, which the server has done before any page is visited, so the
+# clock starts when the script does
+def render(path):
+    from streamlit.testing.v1 import AppTest
+    from streamlit.runtime.scriptrunner import script_runner
+    from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+    started, painted, ended = [], [], []
+    execute = script_runner.exec_func_with_error_handling
+    def timed_execute(func, ctx):
+        started.append(time.perf_counter())
+        try:
+            return (execute(func, ctx))
+        finally:
+            ended.append(time.perf_counter())
+    enqueue = ScriptRunContext.enqueue
+    def timed_enqueue(ctx, msg):
+        if len(painted) < len(started) and msg.HasField('delta'):
+            painted.append(time.perf_counter())
+        return (enqueue(ctx, msg))
+    script_runner.exec_func_with_error_handling = timed_execute
+    ScriptRunContext.enqueue = timed_enqueue
+    app = AppTest.from_file(os.path.abspath(path), default_timeout=TIMEOUT)
+    app.run()
+    app.run()
+    return ({
+        'first_paint_ms': round((painted[0] - started[0]) * 1000, 1) if painted else None,
+        'run_ms': round((ended[0] - started[0]) * 1000, 1),
+        'rerun_ms': round((ended[1] - started[1]) * 1000, 1),
+        'errors': [str(exception.value) for exception in app.exception],
+    })
+
+STEPS = {'imports': imports, 'render': render}
+
+def child(step, path):
+    env = dict(os.environ, DIAGNOSTICS='')
+    env.setdefault('SALES_BACKEND', 'embedded')
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.startup', '--run', step, path],
+        env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return ({'failed': result.stderr.strip().splitlines()[-1:]})
+    return (json.loads(result.stdout.strip().splitlines()[-1]))
+
+# Medians of repeat cold runs of each step of a page
+def benchmark(path, repeat):
+    results = {}
+    for step in STEPS:
+        runs = [child(step, path) for _ in range(repeat)]
+        failed = [run['failed'] for run in runs if 'failed' in run]
+        if failed:
+            results['failed'] = failed[0]
+            continue
+        for key, value in runs[0].items():
+            if key == 'errors':
+                results[key] = value
+            elif value is not None:
+                results[key] = statistics.median(run[key] for run in runs)
+    return (results)
+
+def report(all_results):
+    columns = ['imports_ms', 'modules', 'first_paint_ms', 'run_ms', 'rerun_ms']
+    width = max(len(path) for path in all_results)
+    print(f"{'page':<{width}} " + ' '.join(f'{column:>14}' for column in columns))
+    for path, results in all_results.items():
+        cells = [f'{results[column]:>14,.1f}' if column in results else f"{'-':>14}" for column in columns]
+        print(f'{path:<{width}} ' + ' '.join(cells))
+        if results.get('failed'):
+            print(f"{'':<{width}} failed: {results['failed'][0]}")
+        if results.get('errors'):
+            print(f"{'':<{width}} raised: {results['errors'][0][:100]}")
+
+def main(args):
+    if args.run:
+        step, path = args.run
+        print(json.dumps(STEPS[step](path)))
+        return
+    all_results = {path: benchmark(path, args.repeat) for path in args.pages}
+    report(all_results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(all_results, f, indent=2)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cold start of the app pages, imports and first paint')
+    parser.add_argument('--pages', nargs='+', default=PAGES)
+    parser.add_argument('--repeat', type=int, default=3, help='cold runs per page, the median is reported')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--run', nargs=2, metavar=('STEP', 'PAGE'), help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+# Questions at least this similar (cosine) to a cached one get its answer
+ANSWER_CACHE_THRESHOLD = float(os.environ.get('CHAT_ANSWER_CACHE_THRESHOLD', 0.95))
+ANSWER_CACHE_SIZE = int(os.environ.get('CHAT_ANSWER_CACHE_SIZE', 512))
+
+# Same key regardless of case, accents and punctuation
+def normalize(question):
+    question = unicodedata.normalize('NFKD', question.lower()).encode('ascii', 'ignore').decode()
+    return (' '.join(re.findall(r'\w+', question)))
+
+# Answers by standalone question, shared by every session of a chat page.
+# Identical questions (ignoring case and punctuation) are found without
+# embedding them; near-duplicates are matched on the query embedding.
+# Answers retrieved under different metadata filters are kept apart by scope.
+class AnswerCache():
+
+    def __init__(self, embed_model, threshold=ANSWER_CACHE_THRESHOLD, maxsize=ANSWER_CACHE_SIZE):
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.index_digest = None
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    # Answers only hold for the index they came from
+    def validate(self, index_digest):
+        with self.lock:
+            if index_digest != self.index_digest:
+                self.entries.clear()
+                self.index_digest = index_digest
+
+    def embed(self, question):
+        vector = np.asarray(self.embed_model.get_query_embedding(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector)
+
+    def lookup(self, question, scope=''):
+        key = (scope, normalize(question))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.exact_hits += 1
+                return (self.entries[key][1])
+            keys = [k for k in self.entries if k[0] == scope]
+            if not keys:
+                self.misses += 1
+                return (None)
+            vectors = np.stack([self.entries[k][0] for k in keys])
+        similarities = vectors @ self.embed(question)
+        best = int(np.argmax(similarities))
+        with self.lock:
+            if similarities[best] >= self.threshold and keys[best] in self.entries:
+                self.entries.move_to_end(keys[best])
+                self.similar_hits += 1
+                return (self.entries[keys[best]][1])
+            self.misses += 1
+            return (None)
+
+    def put(self, question, answer, scope=''):
+        key = (scope, normalize(question))
+        vector = self.embed(question)
+        with self.lock:
+            self.entries[key] = (vector, answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return ({
+                'exact_hits': self.exact_hits,
+                'similar_hits': self.similar_hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+            })
@@ -0,0 +1,22 @@
+import streamlit as st
+from chat.memory import split_messages
+
+def timing(message):
+    cached = " (cache)" if message.get("cache_hit") else ""
+    return (f"Primeira palavra em {message['first_token_seconds']:.2f}s, resposta completa em {message['total_seconds']:.2f}s{cached}")
+
+def render_message(message):
+    with st.chat_message(message["role"]):
+        st.write(message["content"])
+        if "first_token_seconds" in message:
+            st.caption(timing(message))
+
+# Recent messages on every rerun, older ones only when asked for
+def render_history(messages):
+    older, recent = split_messages(messages)
+    if older and st.toggle(f"Mostrar {len(older)} mensagens anteriores", key="show_older_messages"):
+        with st.container(border=True):
+            for message in older:
+                render_message(message)
+    for message in recent:
+        render_message(message)
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from llama_index.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.base import BaseEmbedding
+
+# Embedding backend of the chat indexes: openai (remote), local (a
+# sentence-transformers model on CPU) or hash (no model, no network)
+EMBED_BACKEND = os.environ.get('CHAT_EMBED_BACKEND', 'openai')
+LOCAL_EMBED_MODEL = os.environ.get(
+    'CHAT_LOCAL_EMBED_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+
+# Chunks per backend request and requests running at the same time
+EMBED_BATCH_SIZE = int(os.environ.get('CHAT_EMBED_BATCH_SIZE', 64))
+EMBED_WORKERS = int(os.environ.get('CHAT_EMBED_WORKERS', 4))
+
+# Vectors already computed, by model and chunk text
+EMBED_CACHE = os.environ.get('CHAT_EMBED_CACHE', './storage/embeddings.sqlite')
+
+# Feature hashing of the words of a text: fully offline, meant for index
+# builds in development and tests rather than for answer quality
+class HashingEmbedding(BaseEmbedding):
+
+    dimensions: int = 512
+
+    @classmethod
+    def class_name(cls):
+        return ('HashingEmbedding')
+
+    def embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'little')
+            vector[h % self.dimensions] += 1.0 if h >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return ((vector / norm if norm else vector).tolist())
+
+    def _get_query_embedding(self, query):
+        return (self.embed(query))
+
+    async def _aget_query_embedding(self, query):
+        return (self.embed(query))
+
+    def _get_text_embedding(self, text):
+        return (self.embed(text))
+
+# Content-addressed vectors in a SQLite file shared by every index build
+class EmbeddingCache():
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)')
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(batch))})', batch)
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return (found)
+
+    def put_many(self, items):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO embeddings VALUES (?, ?)',
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()])
+
+# Wraps a backend: chunks already embedded by the same model come from the
+# cache, the others are sent in batches by a bounded pool of workers
+class CachedEmbedding(BaseEmbedding):
+
+    _backend = PrivateAttr()
+    _cache = PrivateAttr()
+    _batch_size = PrivateAttr()
+    _workers = PrivateAttr()
+
+    def __init__(self, backend, cache, batch_size, workers):
+        # The index hands over as many chunks as allowed, batching happens here
+        super().__init__(model_name=backend.model_name, embed_batch_size=2048)
+        self._backend = backend
+        self._cache = cache
+        self._batch_size = batch_size
+        self._workers = workers
+
+    @classmethod
+    def class_name(cls):
+        return ('CachedEmbedding')
+
+    def key(self, text):
+        return (hashlib.sha256(f'{self._backend.class_name()}:{self.model_name}:{text}'.encode()).hexdigest())
+
+    def embed_batch(self, texts):
+        return (self._backend.get_text_embedding_batch(texts))
+
+    def _get_text_embeddings(self, texts):
+        keys = [self.key(text) for text in texts]
+        vectors = self._cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing[key] = text
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[i:i + self._batch_size] for i in range(0, len(missing_keys), self._batch_size)]
+            with ThreadPoolExecutor(self._workers) as executor:
+                results = executor.map(lambda batch: self.embed_batch([missing[k] for k in batch]), batches)
+                new_vectors = {}
+                for batch, batch_vectors in zip(batches, results):
+                    new_vectors.update(zip(batch, batch_vectors))
+            self._cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+        return ([vectors[key] for key in keys])
+
+    def _get_text_embedding(self, text):
+        return (self._get_text_embeddings([text])[0])
+
+    def _get_query_embedding(self, query):
+        return (self._backend.get_query_embedding(query))
+
+    async def _aget_query_embedding(self, query):
+        return (await self._backend.aget_query_embedding(query))
+
+def backend_model(backend):
+    if backend == 'hash':
+        return (HashingEmbedding(model_name='hash-512'))
+    if backend == 'local':
+        from llama_index.embeddings import HuggingFaceEmbedding
+        return (HuggingFaceEmbedding(model_name=LOCAL_EMBED_MODEL, device='cpu', embed_batch_size=EMBED_BATCH_SIZE))
+    from llama_index.embeddings import OpenAIEmbedding
+    return (OpenAIEmbedding(embed_batch_size=EMBED_BATCH_SIZE))
+
+# Embedding model for the chat indexes, cached and batched
+def embed_model(backend=EMBED_BACKEND):
+    return (CachedEmbedding(backend_model(backend), EmbeddingCache(EMBED_CACHE), EMBED_BATCH_SIZE, EMBED_WORKERS))
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+from llama_index import (
+    ServiceContext,
+    SimpleDirectoryReader,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+from llama_index.node_parser import SimpleNodeParser
+from lazy import lazy
+
+# pypdf is only needed to build an index, not to load a persisted one
+ingestion = lazy('chat.ingestion')
+
+# Vector indexes are persisted under INDEX_ROOT, one folder per chat page
+INDEX_ROOT = os.environ.get('CHAT_INDEX_DIR', './storage')
+MANIFEST = 'manifest.json'
+
+# structured: PDFs are split by section with tables kept whole (chat.ingestion)
+# simple: every file is read as flat text and cut every chunk_size tokens
+INGESTION = os.environ.get('CHAT_INGESTION', 'structured')
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return (digest.hexdigest())
+
+# Content hash of every file under input_dir, by path
+def files_digest(input_dir):
+    digests = {}
+    for root, _, files in os.walk(input_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            digests[os.path.relpath(path, input_dir)] = file_digest(path)
+    return (digests)
+
+def read_manifest(persist_dir):
+    try:
+        with open(os.path.join(persist_dir, MANIFEST)) as f:
+            return (json.load(f))
+    except (OSError, ValueError):
+        return (None)
+
+def write_manifest(persist_dir, manifest):
+    with open(os.path.join(persist_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+# Hash of what an index was built from, changes whenever it is rebuilt or updated
+def index_digest(name):
+    manifest = read_manifest(os.path.join(INDEX_ROOT, name))
+    return (hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest())
+
+def read_documents(input_dir, paths):
+    reader = SimpleDirectoryReader(
+        input_files=[os.path.join(input_dir, path) for path in paths],
+        filename_as_id=True
+    )
+    return (reader.load_data())
+
+def read_nodes(input_dir, paths, service_context, chunk_size, mode):
+    pdfs = [path for path in paths if mode == 'structured' and path.lower().endswith('.pdf')]
+    others = [path for path in paths if path not in pdfs]
+    nodes = []
+    for path in pdfs:
+        nodes += ingestion.pdf_nodes(os.path.join(input_dir, path), path, chunk_size)
+    if others:
+        nodes += service_context.node_parser.get_nodes_from_documents(read_documents(input_dir, others))
+    return (nodes)
+
+# Vector index of the files in input_dir, loaded from disk when the files and
+# the settings are unchanged. When only some files changed, just their
+# documents are parsed and embedded again; new settings rebuild everything.
+def load_or_build(name, input_dir, llm, chunk_size, embed_model, ingestion=INGESTION, **settings):
+    # Vectors from another embedding model are not comparable, so it is a setting
+    settings = dict(settings, chunk_size=chunk_size, embed_model=embed_model.model_name, ingestion=ingestion)
+    service_context = ServiceContext.from_defaults(
+        llm=llm,
+        embed_model=embed_model,
+        node_parser=SimpleNodeParser.from_defaults(chunk_size=chunk_size)
+    )
+    persist_dir = os.path.join(INDEX_ROOT, name)
+    manifest = read_manifest(persist_dir)
+    digests = files_digest(input_dir)
+
+    if manifest is None or manifest['settings'] != settings:
+        nodes = read_nodes(input_dir, sorted(digests), service_context, chunk_size, ingestion)
+        index = VectorStoreIndex(nodes, service_context=service_context)
+    else:
+        storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+        index = load_index_from_storage(storage_context, service_context=service_context)
+        if manifest['files'] == digests:
+            return (index)
+        # Drop the documents of changed or removed files, then add the new versions
+        stale = [path for path, digest in manifest['files'].items() if digests.get(path) != digest]
+        stale_paths = {os.path.abspath(os.path.join(input_dir, path)) for path in stale}
+        for ref_doc_id, info in list(index.ref_doc_info.items()):
+            if os.path.abspath(info.metadata.get('file_path', '')) in stale_paths:
+                index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+        changed = [path for path, digest in digests.items() if manifest['files'].get(path) != digest]
+        if changed:
+            index.insert_nodes(read_nodes(input_dir, changed, service_context, chunk_size, ingestion))
+
+    index.storage_context.persist(persist_dir=persist_dir)
+    write_manifest(persist_dir, {'settings': settings, 'files': digests})
+    return (index)
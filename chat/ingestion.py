@@ -0,0 +1,206 @@
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from llama_index.node_parser import SentenceSplitter
+from llama_index.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.utils import get_tokenizer
+
+# Processes extracting the text of PDF pages
+INGEST_WORKERS = int(os.environ.get('CHAT_INGEST_WORKERS', os.cpu_count() or 1))
+
+# Amounts as printed in the statements: 1.234.567, (498.975), 0,089, 12,2%
+AMOUNT = re.compile(r'^\(?-?\d{1,3}(?:\.\d{3})*(?:,\d+)?\)?%?$|^\(?-?\d+,\d+\)?%?$')
+YEAR = re.compile(r'^(?:19|20)\d\d$')
+# Numbered notes and items: "17. Fornecedores", "2.2. Impactos relacionados ..."
+NUMBERED_HEADING = re.compile(r'^\d{1,2}(?:\.\d{1,2})*\.\s+[A-ZÀ-Ý]')
+
+# A line repeated at the top of this share of pages is a running header
+HEADER_SHARE = 0.05
+HEADER_LINES = 8
+
+# Metadata the LLM and the embedding see, besides the chunk text
+HIDDEN_METADATA = ['file_path', 'kind']
+
+def numbers(line):
+    return (sum(1 for t in line.split() if AMOUNT.match(t) and not t.isdigit() or YEAR.match(t)))
+
+def is_row(line):
+    return (numbers(line) >= 2)
+
+def is_short(line):
+    return (len(line) < 80 and not line.endswith(('.', ';', ',', ':')))
+
+# Text lines of a range of pages, read by one worker process
+def extract_pages(path, start, stop):
+    reader = PdfReader(path)
+    labels = reader.page_labels
+    pages = []
+    for i in range(start, stop):
+        lines = [line.strip() for line in (reader.pages[i].extract_text() or '').splitlines()]
+        pages.append((labels[i], lines))
+    return (pages)
+
+def extract(path, workers=INGEST_WORKERS):
+    count = len(PdfReader(path).pages)
+    step = max(1, -(-count // (workers * 2)))
+    ranges = [(start, min(start + step, count)) for start in range(0, count, step)]
+    if workers <= 1:
+        return ([page for start, stop in ranges for page in extract_pages(path, start, stop)])
+    with ProcessPoolExecutor(workers) as executor:
+        parts = executor.map(extract_pages, [path] * len(ranges), *zip(*ranges))
+        return ([page for part in parts for page in part])
+
+# Lines printed at the top of many pages, for pages without a page number
+def running_headers(pages):
+    counts = Counter()
+    for _, lines in pages:
+        counts.update(set(line for line in lines[:HEADER_LINES] if line))
+    return ({line for line, count in counts.items() if count >= HEADER_SHARE * len(pages)})
+
+# Lines of a page without its running header, which ends at the page number
+def strip_header(lines, label, headers):
+    for n, line in enumerate(lines[:HEADER_LINES]):
+        if line == label or line.startswith(label + ' '):
+            rest = line[len(label):].strip()
+            return (([rest] if rest else []) + lines[n + 1:])
+    return ([line for n, line in enumerate(lines) if n >= HEADER_LINES or line not in headers])
+
+def is_heading(lines, i):
+    line = lines[i]
+    if not line or not is_short(line) or is_row(line):
+        return (False)
+    if NUMBERED_HEADING.match(line):
+        return (True)
+    following = [l for l in lines[i + 1:i + 5] if l][:2]
+    # Statement titles come right before the unit they are expressed in
+    if any(l.startswith('(Valores expressos') for l in following):
+        return (True)
+    # Otherwise a short capitalized line standing alone between blank lines
+    isolated = (i == 0 or not lines[i - 1]) and (i + 1 == len(lines) or not lines[i + 1])
+    return (isolated and line[0].isupper() and len(line.split()) <= 10 and not line.startswith('('))
+
+# Headings, paragraphs and tables of one page, in reading order
+def page_blocks(lines):
+    blocks = []
+    paragraph = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if is_row(line):
+            # A line or two right above the rows are column titles
+            caption = paragraph if len(' '.join(paragraph)) < 80 else []
+            if paragraph and not caption:
+                blocks.append(('text', ' '.join(paragraph)))
+            paragraph = []
+            # Row labels and blank lines stay in the table while rows follow
+            end = i + 1
+            while end < len(lines):
+                ahead = [l for l in lines[end:end + 4] if l]
+                label = len(lines[end]) < 80 and not NUMBERED_HEADING.match(lines[end])
+                if is_row(lines[end]) or (label and any(is_row(l) for l in ahead)):
+                    end += 1
+                else:
+                    break
+            blocks.append(('table', '\n'.join(caption + [l for l in lines[i:end] if l])))
+            i = end
+            continue
+        if is_heading(lines, i):
+            if paragraph:
+                blocks.append(('text', ' '.join(paragraph)))
+                paragraph = []
+            blocks.append(('heading', line))
+        elif line:
+            paragraph.append(line)
+        elif paragraph:
+            blocks.append(('text', ' '.join(paragraph)))
+            paragraph = []
+        i += 1
+    if paragraph:
+        blocks.append(('text', ' '.join(paragraph)))
+    return (blocks)
+
+def page_range(pages):
+    return (pages[0] if pages[0] == pages[-1] else f'{pages[0]}-{pages[-1]}')
+
+# Builds the nodes of one PDF: paragraphs of a section are packed up to
+# chunk_size tokens, tables become nodes of their own, split between rows
+# with the header row repeated when they are too long
+class NodeBuilder():
+
+    def __init__(self, path, doc_id, chunk_size):
+        self.path = path
+        self.doc_id = doc_id
+        self.chunk_size = chunk_size
+        self.splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=0)
+        self.tokens = lambda text: len(get_tokenizer()(text))
+        self.nodes = []
+        self.section = ''
+        self.paragraphs = []
+
+    def node(self, text, pages, kind):
+        node = TextNode(text=text, metadata={
+            'file_name': os.path.basename(self.path),
+            'file_path': self.path,
+            'page_label': page_range(pages),
+            'section': self.section,
+            'kind': kind,
+        }, excluded_embed_metadata_keys=HIDDEN_METADATA, excluded_llm_metadata_keys=HIDDEN_METADATA)
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=self.doc_id)
+        self.nodes.append(node)
+
+    def flush(self):
+        texts, pages, size = [], [], 0
+        for text, page in self.paragraphs:
+            tokens = self.tokens(text)
+            if texts and size + tokens > self.chunk_size:
+                self.node('\n\n'.join(texts), pages, 'text')
+                texts, pages, size = [], [], 0
+            if tokens > self.chunk_size:
+                for part in self.splitter.split_text(text):
+                    self.node(part, [page], 'text')
+                continue
+            texts.append(text)
+            pages.append(page)
+            size += tokens
+        if texts:
+            self.node('\n\n'.join(texts), pages, 'text')
+        self.paragraphs = []
+
+    def heading(self, text, page):
+        self.flush()
+        self.section = text
+
+    def table(self, text, page):
+        self.flush()
+        rows = text.split('\n')
+        # Title, unit and column lines above the first amounts
+        header = []
+        for row in rows[:4]:
+            if any(AMOUNT.match(t) and not t.isdigit() for t in row.split()):
+                break
+            header.append(row)
+        chunk, size = list(header), self.tokens('\n'.join(header))
+        for row in rows[len(header):]:
+            tokens = self.tokens(row)
+            if len(chunk) > len(header) and size + tokens > self.chunk_size:
+                self.node('\n'.join(chunk), [page], 'table')
+                chunk, size = list(header), self.tokens('\n'.join(header))
+            chunk.append(row)
+            size += tokens
+        self.node('\n'.join(chunk), [page], 'table')
+
+    def text(self, text, page):
+        self.paragraphs.append((text, page))
+
+# Table-aware nodes of a PDF with page and section metadata
+def pdf_nodes(path, doc_id, chunk_size, workers=INGEST_WORKERS):
+    pages = extract(path, workers)
+    headers = running_headers(pages)
+    builder = NodeBuilder(path, doc_id, chunk_size)
+    for page, lines in pages:
+        for kind, text in page_blocks(strip_header(lines, page, headers)):
+            getattr(builder, kind)(text, page)
+    builder.flush()
+    return (builder.nodes)
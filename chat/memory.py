@@ -0,0 +1,79 @@
+import os
+from llama_index.llms import ChatMessage, MessageRole
+from llama_index.llms.generic_utils import messages_to_history_str
+from llama_index.prompts import PromptTemplate
+from llama_index.utils import get_tokenizer
+
+# Tokens of recent messages the LLM sees when condensing a question; older
+# messages are folded into a summary
+HISTORY_TOKENS = int(os.environ.get('CHAT_HISTORY_TOKENS', 1500))
+
+# Messages rendered on every rerun and kept at all in a session
+VISIBLE_MESSAGES = int(os.environ.get('CHAT_VISIBLE_MESSAGES', 20))
+MAX_MESSAGES = int(os.environ.get('CHAT_MAX_MESSAGES', 200))
+
+SUMMARY_PROMPT = PromptTemplate(
+    "Resuma em até 150 palavras a conversa abaixo entre um usuário e um assistente "
+    "sobre o balanço financeiro do MAGALU, mantendo os fatos, valores e assuntos citados.\n"
+    "Resumo anterior:\n{summary}\n"
+    "Novas mensagens:\n{conversation}\n"
+    "Resumo:"
+)
+
+# Conversation the LLM sees: a window of recent messages within a token
+# budget plus a rolling summary of everything before it. Going over budget
+# folds the oldest messages until the window is half full, so the summary
+# is rewritten every few turns rather than on each one.
+class ChatMemory():
+
+    def __init__(self, llm, token_limit=HISTORY_TOKENS):
+        self.llm = llm
+        self.token_limit = token_limit
+        self.summary = ''
+        self.window = []
+        self.window_tokens = 0
+
+    def add(self, role, content):
+        tokens = len(get_tokenizer()(content))
+        self.window.append((ChatMessage(role=role, content=content), tokens))
+        self.window_tokens += tokens
+
+    def add_turn(self, question, answer):
+        self.add(MessageRole.USER, question)
+        self.add(MessageRole.ASSISTANT, answer)
+
+    def messages(self):
+        summary = [ChatMessage(role=MessageRole.SYSTEM, content=f'Resumo da conversa: {self.summary}')] if self.summary else []
+        return (summary + [message for message, _ in self.window])
+
+    def history_str(self):
+        return (messages_to_history_str(self.messages()))
+
+    def __bool__(self):
+        return (bool(self.window or self.summary))
+
+    # Folds the oldest messages into the summary once over budget, always
+    # keeping the last question and answer
+    def compact(self):
+        if self.window_tokens <= self.token_limit:
+            return (False)
+        folded = []
+        while len(self.window) > 2 and self.window_tokens > self.token_limit // 2:
+            message, tokens = self.window.pop(0)
+            self.window_tokens -= tokens
+            folded.append(message)
+        if folded:
+            self.summary = self.llm.predict(
+                SUMMARY_PROMPT,
+                summary=self.summary or '-',
+                conversation=messages_to_history_str(folded),
+            ).strip()
+        return (bool(folded))
+
+# The last MAX_MESSAGES messages of a session, the ones it keeps
+def trim_messages(messages):
+    return (messages[-MAX_MESSAGES:])
+
+# Messages of a session split into older and recent ones
+def split_messages(messages):
+    return (messages[:-VISIBLE_MESSAGES], messages[-VISIBLE_MESSAGES:])
@@ -0,0 +1,173 @@
+import os
+from collections import Counter, defaultdict
+import numpy as np
+from llama_index.bridge.pydantic import PrivateAttr
+from llama_index.core.base_retriever import BaseRetriever
+from llama_index.postprocessor.types import BaseNodePostprocessor
+from llama_index.schema import MetadataMode, NodeWithScore
+from llama_index.vector_stores.types import ExactMatchFilter, MetadataFilters
+from chat.answer_cache import normalize
+
+# Scorer of the local reranker: lexical (query terms and phrases found in the
+# chunk, no model) or cross-encoder (a sentence-transformers model on CPU)
+RERANK_SCORER = os.environ.get('CHAT_RERANK_SCORER', 'lexical')
+RERANK_MODEL = os.environ.get('CHAT_RERANK_MODEL', 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1')
+
+# Ranks are fused as 1 / (FUSION_K + rank), the usual reciprocal rank fusion
+FUSION_K = 60
+
+STOPWORDS = set('a o as os e de da do das dos em no na nos nas um uma por para com que qual quais '
+                'se ao aos ou sua seu suas seus foi sao ser como mais the of'.split())
+
+def tokenize(text):
+    return ([t for t in normalize(text).split() if t not in STOPWORDS])
+
+def node_text(node):
+    return (node.get_content(metadata_mode=MetadataMode.EMBED))
+
+# {key: value} metadata filters, e.g. {'kind': 'table'}, as the vector store takes them
+def metadata_filters(filters):
+    if not filters:
+        return (None)
+    return (MetadataFilters(filters=[ExactMatchFilter(key=key, value=value) for key, value in sorted(filters.items())]))
+
+def matches(node, filters):
+    return (all(node.metadata.get(key) == value for key, value in (filters or {}).items()))
+
+# Okapi BM25 over the chunks of an index. Term weights are computed once, a
+# search only adds up the postings of the query terms.
+class BM25Index():
+
+    def __init__(self, nodes, k1=1.2, b=0.75):
+        self.nodes = list(nodes)
+        postings = defaultdict(list)
+        lengths = np.zeros(len(self.nodes))
+        for i, node in enumerate(self.nodes):
+            terms = tokenize(node_text(node))
+            lengths[i] = len(terms)
+            for term, tf in Counter(terms).items():
+                postings[term].append((i, tf))
+        norm = k1 * (1 - b + b * lengths / (lengths.mean() if len(self.nodes) else 1))
+        self.idf = {}
+        self.postings = {}
+        for term, items in postings.items():
+            docs = np.array([doc for doc, _ in items])
+            tf = np.array([tf for _, tf in items], dtype=np.float64)
+            self.idf[term] = np.log(1 + (len(self.nodes) - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = (docs, self.idf[term] * tf * (k1 + 1) / (tf + norm[docs]))
+
+    @classmethod
+    def from_index(cls, index):
+        return (cls(index.docstore.docs.values()))
+
+    def scores(self, query):
+        scores = np.zeros(len(self.nodes))
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                docs, weights = self.postings[term]
+                scores[docs] += weights
+        return (scores)
+
+    # Values of a metadata key, e.g. the sections of the document, among the
+    # chunks matching the filters
+    def values(self, key, filters=None):
+        return (sorted({node.metadata[key] for node in self.nodes if node.metadata.get(key) and matches(node, filters)}))
+
+    def search(self, query, top_k, filters=None):
+        scores = self.scores(query)
+        if filters:
+            scores *= np.array([matches(node, filters) for node in self.nodes])
+        ranked = [i for i in np.argsort(-scores, kind='stable')[:top_k] if scores[i] > 0]
+        return ([NodeWithScore(node=self.nodes[i], score=float(scores[i])) for i in ranked])
+
+# Vector and keyword results merged by reciprocal rank fusion, both limited
+# to the chunks matching the metadata filters
+class HybridRetriever(BaseRetriever):
+
+    def __init__(self, index, keyword_index, top_k=10, filters=None):
+        super().__init__()
+        self.vector_retriever = index.as_retriever(similarity_top_k=top_k, filters=metadata_filters(filters))
+        self.keyword_index = keyword_index
+        self.top_k = top_k
+        self.filters = filters
+
+    def fuse(self, *rankings):
+        fused = {}
+        nodes = {}
+        for ranking in rankings:
+            for rank, node in enumerate(ranking):
+                node_id = node.node.node_id
+                nodes.setdefault(node_id, node.node)
+                fused[node_id] = fused.get(node_id, 0.0) + 1.0 / (FUSION_K + rank + 1)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:self.top_k]
+        return ([NodeWithScore(node=nodes[node_id], score=fused[node_id]) for node_id in ranked])
+
+    def _retrieve(self, query_bundle):
+        return (self.fuse(
+            self.vector_retriever.retrieve(query_bundle),
+            self.keyword_index.search(query_bundle.query_str, self.top_k, self.filters),
+        ))
+
+    async def _aretrieve(self, query_bundle):
+        return (self.fuse(
+            await self.vector_retriever.aretrieve(query_bundle),
+            self.keyword_index.search(query_bundle.query_str, self.top_k, self.filters),
+        ))
+
+# Query terms and consecutive term pairs found in each chunk, weighted by
+# their IDF, so exact line-item names outrank loosely related chunks
+class LexicalScorer():
+
+    def __init__(self, keyword_index):
+        self.idf = keyword_index.idf
+        self.default_idf = max(self.idf.values(), default=1.0)
+
+    def __call__(self, query, texts):
+        terms = tokenize(query)
+        pairs = set(zip(terms, terms[1:]))
+        scores = []
+        for text in texts:
+            tokens = tokenize(text)
+            found = set(tokens)
+            found_pairs = set(zip(tokens, tokens[1:]))
+            score = sum(self.idf.get(t, self.default_idf) for t in set(terms) if t in found)
+            score += sum(self.idf.get(a, self.default_idf) + self.idf.get(b, self.default_idf)
+                         for a, b in pairs if (a, b) in found_pairs)
+            scores.append(score)
+        return (scores)
+
+class CrossEncoderScorer():
+
+    def __init__(self, model_name=RERANK_MODEL):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, max_length=512, device='cpu')
+
+    def __call__(self, query, texts):
+        return ([float(s) for s in self.model.predict([(query, text) for text in texts])])
+
+def scorer(keyword_index, name=RERANK_SCORER):
+    if name == 'cross-encoder':
+        return (CrossEncoderScorer())
+    return (LexicalScorer(keyword_index))
+
+# Reranks the retrieved nodes in process with any scorer(query, texts)
+class LocalRerank(BaseNodePostprocessor):
+
+    top_n: int = 2
+    _scorer = PrivateAttr()
+
+    def __init__(self, scorer, top_n=2):
+        super().__init__(top_n=top_n)
+        self._scorer = scorer
+
+    @classmethod
+    def class_name(cls):
+        return ('LocalRerank')
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        if not nodes:
+            return ([])
+        scores = self._scorer(query_bundle.query_str, [node_text(node.node) for node in nodes])
+        # Stable on ties, so retrieval order decides between equal scores
+        ranked = sorted(range(len(nodes)), key=lambda i: -scores[i])[:self.top_n]
+        return ([NodeWithScore(node=nodes[i].node, score=float(scores[i])) for i in ranked])
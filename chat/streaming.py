@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from llama_index.chat_engine.condense_question import DEFAULT_PROMPT
+from llama_index.response_synthesizers import get_response_synthesizer
+from chat.memory import ChatMemory
+from diagnostics import spans
+
+# Answer when retrieval finds nothing, the synthesizer has no stream then
+NO_CONTENT = "Não encontrei nas demonstrações nenhum trecho sobre essa pergunta. Tente reformulá-la ou ampliar os filtros."
+
+# condense_question chat with the answer streamed token by token. Retrieval
+# for the question as typed starts while the LLM condenses it with the
+# history, and is used whenever the condensed question comes back the same.
+# With an answer cache, standalone questions answered before skip retrieval
+# and generation. The history is a bounded ChatMemory.
+class StreamingChatEngine():
+
+    def __init__(self, index, similarity_top_k=2, node_postprocessors=None, answer_cache=None, retriever=None):
+        self.llm = index.service_context.llm
+        self.retriever = retriever or index.as_retriever(similarity_top_k=similarity_top_k)
+        self.node_postprocessors = node_postprocessors or []
+        self.synthesizer = get_response_synthesizer(service_context=index.service_context, streaming=True)
+        self.answer_cache = answer_cache
+        self.memory = ChatMemory(self.llm)
+        self.cache_hit = False
+        self.first_token_seconds = None
+        self.total_seconds = None
+        # One event loop for the life of the engine: the OpenAI LLM and
+        # embedding keep their async HTTP client between calls, and its
+        # connections are bound to the loop that opened them
+        self.loop = asyncio.new_event_loop()
+        self.loop_lock = threading.Lock()
+
+    # Answers depend on the metadata filters of the retriever, if any
+    def cache_scope(self):
+        return (repr(sorted((getattr(self.retriever, 'filters', None) or {}).items())))
+
+    async def acondense(self, message):
+        if not self.memory:
+            return (message)
+        return (await self.llm.apredict(
+            DEFAULT_PROMPT,
+            question=message,
+            chat_history=self.memory.history_str()
+        ))
+
+    # Standalone question and either its cached answer or its context nodes
+    async def aprepare(self, message):
+        speculative = asyncio.ensure_future(self.retriever.aretrieve(message))
+        question = await self.acondense(message)
+        cached = self.answer_cache.lookup(question, self.cache_scope()) if self.answer_cache else None
+        if cached is not None:
+            speculative.cancel()
+            return (question, cached, None)
+        if question.strip() == message.strip():
+            nodes = await speculative
+        else:
+            speculative.cancel()
+            nodes = await self.retriever.aretrieve(question)
+        for postprocessor in self.node_postprocessors:
+            nodes = postprocessor.postprocess_nodes(nodes, query_str=question)
+        return (question, None, nodes)
+
+    # Reruns of a session may run on different threads, never at once
+    def prepare(self, message):
+        with self.loop_lock:
+            return (self.loop.run_until_complete(self.aprepare(message)))
+
+    # Tokens of the answer as the LLM produces them
+    def stream_chat(self, message):
+        start = time.perf_counter()
+        self.first_token_seconds = None
+        with spans.span('chat.prepare'):
+            question, cached, nodes = self.prepare(message)
+        self.cache_hit = cached is not None
+        # Nothing retrieved: neither a real answer to cache nor a turn to remember
+        answered = self.cache_hit or bool(nodes)
+        if self.cache_hit:
+            tokens = [cached]
+        elif nodes:
+            tokens = self.synthesizer.synthesize(question, nodes).response_gen
+        else:
+            tokens = [NO_CONTENT]
+        answer = []
+        for token in tokens:
+            if self.first_token_seconds is None:
+                self.first_token_seconds = time.perf_counter() - start
+            answer.append(token)
+            yield token
+        self.total_seconds = time.perf_counter() - start
+        if self.first_token_seconds is None:
+            self.first_token_seconds = self.total_seconds
+        spans.record('chat.first_token', self.first_token_seconds)
+        spans.record('chat.answer', self.total_seconds)
+        if not answered:
+            return
+        if self.answer_cache and not self.cache_hit:
+            self.answer_cache.put(question, ''.join(answer), self.cache_scope())
+        # After the answer is out, so a summary rewrite never delays it
+        self.memory.add_turn(message, ''.join(answer))
+        with spans.span('chat.memory_compact'):
+            self.memory.compact()
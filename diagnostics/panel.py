@@ -0,0 +1,22 @@
+import pandas as pd
+import streamlit as st
+from diagnostics import spans
+
+# Stage latencies in the sidebar and as a JSON download; with
+# DIAGNOSTICS_EXPORT set the same JSON is also written to that file. Called
+# at the end of a page, so the run it is part of is already counted
+def sidebar():
+    if not spans.ENABLED:
+        return
+    summary = spans.stats.summary()
+    if spans.EXPORT_PATH:
+        spans.stats.export(spans.EXPORT_PATH)
+    with st.sidebar.expander("Diagnostics"):
+        if not summary:
+            st.caption("No spans recorded yet")
+            return
+        summary_df = pd.DataFrame.from_dict(summary, orient='index')
+        st.dataframe(summary_df[['count', 'p50_ms', 'p95_ms', 'max_ms']], use_container_width=True)
+        st.download_button("Export JSON", spans.stats.to_json(), file_name="diagnostics.json", mime="application/json")
+        if st.button("Reset"):
+            spans.stats.reset()
@@ -0,0 +1,116 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Timing of the hot paths, off unless DIAGNOSTICS is set: then every span
+# records its duration and the pages show the diagnostics sidebar
+ENABLED = os.environ.get('DIAGNOSTICS', '') not in ('', '0', 'false')
+
+# Latest durations kept per stage for the percentiles
+WINDOW = int(os.environ.get('DIAGNOSTICS_WINDOW', 1000))
+
+# File the summary is written to after each page run, when set
+EXPORT_PATH = os.environ.get('DIAGNOSTICS_EXPORT', '')
+
+PERCENTILES = [50, 95, 99]
+
+# Durations per stage, shared by every session of the process
+class SpanStats():
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.counts = {}
+        self.totals = {}
+
+    def record(self, stage, seconds):
+        with self.lock:
+            if stage not in self.durations:
+                self.durations[stage] = deque(maxlen=self.window)
+                self.counts[stage] = 0
+                self.totals[stage] = 0.0
+            self.durations[stage].append(seconds)
+            self.counts[stage] += 1
+            self.totals[stage] += seconds
+
+    # Count, total and percentiles of the recent durations, in milliseconds
+    def summary(self):
+        with self.lock:
+            recent = {stage: np.array(durations) * 1000 for stage, durations in self.durations.items()}
+            counts, totals = dict(self.counts), dict(self.totals)
+        summary = {}
+        for stage in sorted(recent):
+            values = np.percentile(recent[stage], PERCENTILES + [100])
+            summary[stage] = {'count': counts[stage], 'total_ms': round(totals[stage] * 1000, 3)}
+            summary[stage].update({f'p{p}_ms': round(v, 3) for p, v in zip(PERCENTILES, values)})
+            summary[stage]['max_ms'] = round(values[-1], 3)
+        return (summary)
+
+    def to_json(self):
+        return (json.dumps({'time': time.time(), 'pid': os.getpid(), 'stages': self.summary()}, indent=2))
+
+    # Written aside and moved in place, so a collector never reads half a file
+    def export(self, path):
+        partial = f'{path}.{os.getpid()}'
+        with open(partial, 'w') as f:
+            f.write(self.to_json())
+        os.replace(partial, path)
+
+    def reset(self):
+        with self.lock:
+            self.durations.clear()
+            self.counts.clear()
+            self.totals.clear()
+
+stats = SpanStats()
+
+class Span():
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return (self)
+
+    def __exit__(self, *exc):
+        stats.record(self.stage, time.perf_counter() - self.start)
+        return (False)
+
+# Does nothing, handed out for every span while disabled
+class NoSpan():
+
+    def __enter__(self):
+        return (self)
+
+    def __exit__(self, *exc):
+        return (False)
+
+NO_SPAN = NoSpan()
+
+# with span('stage'): times the block
+def span(stage):
+    return (Span(stage) if ENABLED else NO_SPAN)
+
+# @timed('stage') times every call; while disabled the function is returned
+# as is, so it costs nothing
+def timed(stage):
+    def decorate(function):
+        if not ENABLED:
+            return (function)
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with Span(stage):
+                return (function(*args, **kwargs))
+        return (wrapper)
+    return (decorate)
+
+# Durations measured elsewhere, such as time to first token
+def record(stage, seconds):
+    if ENABLED and seconds is not None:
+        stats.record(stage, seconds)
@@ -0,0 +1,30 @@
+# Deferred imports for the pages: a module behind a LazyModule is imported on
+# the first access to one of its attributes, so a page paints its first
+# elements before paying for plotly or llama_index, and never pays for what
+# the current render does not use
+import importlib
+import sys
+
+class LazyModule():
+
+    def __init__(self, name):
+        self.__dict__['name'] = name
+        self.__dict__['module'] = None
+
+    # importlib holds a lock per module, so sessions racing here import it once
+    def load(self):
+        if self.module is None:
+            self.__dict__['module'] = importlib.import_module(self.name)
+        return (self.module)
+
+    def __getattr__(self, attribute):
+        return (getattr(self.load(), attribute))
+
+    def __repr__(self):
+        state = 'loaded' if self.module is not None else 'not loaded'
+        return (f'<lazy module {self.name!r}, {state}>')
+
+# The module itself when some page already imported it
+def lazy(name):
+    module = sys.modules.get(name)
+    return (module if module is not None else LazyModule(name))
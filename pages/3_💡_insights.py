@@ -1,195 +1,148 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import locale
-import plotly.graph_objects as go
-from pinotdb import connect
+from lazy import lazy
+from sales import page, figures
+from diagnostics import spans
+from sales.data import PAY_METHODS, SEASONS, SalesData
+from sales.insights import InsightsCube
 
-# Global variables
-pay_methods = ['PayPal','Credit Card','Cash','Debit Card','Venmo','Bank Transfer']
-seasons = ['Spring','Summer','Fall','Winter']
+# Imported with the first chart, after the selectors are on screen
+px = lazy('plotly.express')
+go = lazy('plotly.graph_objects')
 
-if "pay_methods" not in st.session_state:
-    st.session_state['pay_methods'] = pay_methods
-if "seasons" not in st.session_state:
-    st.session_state['seasons'] = seasons
-
-locale.setlocale( locale.LC_ALL, 'en_CA.UTF-8' )
-
-sales_columns = [
-    'age','category','color','customer_id','discount_applied','frequency_of_purchases',
-    'gender','item_purchased','location','payment_method','previous_purchases','promo_code_used',
-    'purchase_amount_usd','purchase_time','review_rating','season','shipping_type','size','subscription_status'
-]
-
-# Load data
-class InsightData():
-
-    def __init__(self):
-
-        # Read data from Pinot DB
-        conn = connect(host='localhost', port=8000, path='/query/sql', scheme='http')
-        curs = conn.cursor()
-        curs.execute("""SELECT * FROM SalesTxs limit 4000""")
-        self.insights_df = pd.DataFrame(
-            curs.fetchall(),
-            columns=sales_columns
-        )
-        # Retirar linha abaixo após mudar tipo da coluna "age" para INT
-        self.insights_df['age'] = self.insights_df['age'].astype(int)
-        
-        self.pay_methods = st.session_state['pay_methods']
-        self.seasons = st.session_state['seasons']
-        
-        # Filter out unselected items
-        self.insights_df = self.insights_df.loc[
-            (self.insights_df['payment_method'].isin(self.pay_methods)) & 
-            (self.insights_df['season'].isin(self.seasons)) 
-        ]
-
-# Auxiliary functions
-def set_age_bin(age):
-    if age < 30:
-        return('twenties')
-    elif age < 40:
-        return('thirties')
-    elif age < 50:
-        return('forties')
-    else:
-        return('senior')
-
-# Set layout
-st.set_page_config(layout="wide")
-
-# Import CSS
-# Importar o conteúdo do arquivo CSS na streamlit tag style
-with open ("./styles.css") as f:
-    st.markdown (f"<style>{f.read()}</style>",unsafe_allow_html=True)
+page.setup()
 
 # Layout
+# Selectors first, so the data is loaded once with both selections
 pm_col, seasons_col = st.columns(2,gap="small")
 with pm_col:
     pm_expander = st.expander("Payment Methods", expanded=True)
-    pm_selected_items = pm_expander.multiselect(
+    st.session_state['pay_methods'] = pm_expander.multiselect(
         'Payment Method',
-        pay_methods,
-        pay_methods
+        PAY_METHODS,
+        st.session_state['pay_methods']
     )
-    st.session_state['pay_methods'] = pm_selected_items
-    insightData = InsightData()
-    
-    disp_df = insightData.insights_df.groupby(['payment_method'])[['customer_id']].agg("count").reset_index()
-    disp_df = disp_df.rename(columns={'customer_id':'purchases'})
-    fig_cus_pm = px.bar(
-            disp_df,
-            x="payment_method",
-            y="purchases",
-            title="Purchases per Payment Methods",
-        )
-    pm_expander.plotly_chart(fig_cus_pm,use_container_width=True)
 
 with seasons_col:
     season_expander = st.expander("Seasons", expanded=True)
-    s_selected_seasons = season_expander.multiselect(
+    st.session_state['seasons'] = season_expander.multiselect(
         'Season',
-        seasons,
-        seasons
+        SEASONS,
+        st.session_state['seasons']
     )
-    st.session_state['seasons'] = s_selected_seasons
-    insightData = InsightData()
 
-    disp_df = insightData.insights_df.groupby(['season'])[['purchase_amount_usd']].agg("sum").reset_index()
-    fig_usd_s = px.bar(
+page.sidebar()
+
+insightData = SalesData({'payment_method': st.session_state['pay_methods'], 'season': st.session_state['seasons']})
+
+page.cache_caption()
+
+with pm_col, spans.span('insights.payment_methods'):
+    disp_df = insightData.aggregate('purchases_by_payment_method')
+    fig_cus_pm = figures.figure('cus_pm', disp_df, lambda disp_df: px.bar(
+            disp_df,
+            x="payment_method",
+            y="purchases",
+            title="Purchases per Payment Methods",
+        ))
+    page.chart(pm_expander, fig_cus_pm)
+    pm_expander.caption(insightData.describe('purchases_by_payment_method'))
+
+with seasons_col, spans.span('insights.seasons'):
+    disp_df = insightData.aggregate('revenue_by_season')
+    fig_usd_s = figures.figure('usd_s', disp_df, lambda disp_df: px.bar(
             disp_df,
             x="season",
             y="purchase_amount_usd",
             title="Purchase Amount (USD) per Season",
-        )
-    season_expander.plotly_chart(fig_usd_s,use_container_width=True)
+        ))
+    page.chart(season_expander, fig_usd_s)
+    season_expander.caption(insightData.describe('revenue_by_season'))
     
-with st.expander("Purchases Amount x USD", expanded=True):
-    qtd_purch = insightData.insights_df.groupby(['item_purchased'])[['customer_id']].agg("count").reset_index()
-    qtd_purch = qtd_purch.rename(columns={'customer_id':'purchases'})
-    usd_purch = insightData.insights_df.groupby(['item_purchased'])[['purchase_amount_usd']].agg("sum").reset_index()
-    fig_p_q_u = go.Figure()
-
-    fig_p_q_u.add_trace(go.Bar(
-        x=usd_purch['item_purchased'],
-        y=usd_purch['purchase_amount_usd'],
-        name="USD"
-    ))
-
-    fig_p_q_u.add_trace(go.Scatter(
-        x=qtd_purch['item_purchased'],
-        y=qtd_purch['purchases'],
-        name="Purchases",
-        yaxis="y2"
-    ))
-
-    fig_p_q_u.update_layout(
-        yaxis=dict(
-            title="USD",
-            titlefont=dict(
-                color="#1f77b4"
+with st.expander("Purchases Amount x USD", expanded=True), spans.span('insights.items'):
+    # Purchases and USD per item in one aggregation
+    item_df = insightData.aggregate('purchases_revenue_by_item').sort_values('item_purchased')
+    def build_p_q_u(item_df):
+        qtd_purch = usd_purch = item_df
+        fig_p_q_u = go.Figure()
+
+        fig_p_q_u.add_trace(go.Bar(
+            x=usd_purch['item_purchased'],
+            y=usd_purch['purchase_amount_usd'],
+            name="USD"
+        ))
+
+        fig_p_q_u.add_trace(go.Scatter(
+            x=qtd_purch['item_purchased'],
+            y=qtd_purch['purchases'],
+            name="Purchases",
+            yaxis="y2"
+        ))
+
+        fig_p_q_u.update_layout(
+            yaxis=dict(
+                title="USD",
+                titlefont=dict(
+                    color="#1f77b4"
+                ),
+                tickfont=dict(
+                    color="#1f77b4"
+                )
             ),
-            tickfont=dict(
-                color="#1f77b4"
+            yaxis2=dict(
+                title="Purchases",
+                titlefont=dict(
+                    color="#ff7f0e"
+                ),
+                tickfont=dict(
+                    color="#ff7f0e"
+                ),
+                anchor="free",
+                overlaying="y",
+                side="right",
+                position=1
             )
-        ),
-        yaxis2=dict(
-            title="Purchases",
-            titlefont=dict(
-                color="#ff7f0e"
-            ),
-            tickfont=dict(
-                color="#ff7f0e"
-            ),
-            anchor="free",
-            overlaying="y",
-            side="right",
-            position=1
         )
-    )
-    st.plotly_chart(fig_p_q_u,use_container_width=True)
+        return (fig_p_q_u)
+    fig_p_q_u = figures.figure('p_q_u', item_df, build_p_q_u)
+    page.chart(st, fig_p_q_u)
+    st.caption(insightData.describe('purchases_revenue_by_item'))
     
-with st.expander("Age, Freq, Paym Method Relationship", expanded=True):
+with st.expander("Age, Freq, Paym Method Relationship", expanded=True), spans.span('insights.age_frequency_payment'):
     ap_col, af_col, fp_col = st.columns(3,gap="small")
-    insight_df = insightData.insights_df[['age','payment_method','frequency_of_purchases','customer_id']].copy()
-    insight_df['age_range'] = insight_df['age'].map(set_age_bin)
-    insight_df = insight_df.drop(columns=['age'])
-    
+    # Age range x payment method x frequency computed once, each chart sums it down
+    insights_cube = InsightsCube(insightData.aggregate('customers_by_age_payment_frequency'))
+    cube_caption = insightData.describe('customers_by_age_payment_frequency')
     # Age x Payment Method
-    display_df =  insight_df.groupby(['age_range','payment_method']).agg("count").reset_index()
-    display_df = display_df.drop(['frequency_of_purchases'],axis=1)
-    display_df = display_df.rename(columns = {'customer_id':'customers'})
-    fig_age_pay = px.bar(
+    display_df = insights_cube.marginal(['age_range','payment_method'])
+    fig_age_pay = figures.figure('age_pay', display_df, lambda display_df: px.bar(
         display_df,
         x="age_range",
         y="customers",
         color = 'payment_method'
-    )
-    ap_col.plotly_chart(fig_age_pay,use_container_width=True)
+    ))
+    page.chart(ap_col, fig_age_pay, key='age_pay')
+    ap_col.caption(cube_caption)
     
     # Age x Frequency of Purchases
-    display_df =  insight_df.groupby(['age_range','frequency_of_purchases']).agg("count").reset_index()
-    display_df = display_df.drop(['payment_method'],axis=1)
-    display_df = display_df.rename(columns = {'customer_id':'customers'})
-    fig_age_freq = px.bar(
+    display_df = insights_cube.marginal(['age_range','frequency_of_purchases'])
+    fig_age_freq = figures.figure('age_freq', display_df, lambda display_df: px.bar(
         display_df,
         x="age_range",
         y="customers",
         color = 'frequency_of_purchases'
-    )
-    af_col.plotly_chart(fig_age_freq,use_container_width=True)
+    ))
+    page.chart(af_col, fig_age_freq, key='age_freq')
+    af_col.caption(cube_caption)
 
     # Frequency of Purchases x Payment Method
-    display_df =  insight_df.groupby(['frequency_of_purchases','payment_method']).agg("count").reset_index()
-    display_df = display_df.drop(['age_range'],axis=1)
-    display_df = display_df.rename(columns = {'customer_id':'customers'})
-    fig_freq_pay = px.bar(
+    display_df = insights_cube.marginal(['frequency_of_purchases','payment_method'])
+    fig_freq_pay = figures.figure('freq_pay', display_df, lambda display_df: px.bar(
         display_df,
         x="frequency_of_purchases",
         y="customers",
         color = 'payment_method'
-    )
-    fp_col.plotly_chart(fig_freq_pay,use_container_width=True)
\ No newline at end of file
+    ))
+    page.chart(fp_col, fig_freq_pay, key='freq_pay')
+    fp_col.caption(cube_caption)
+
+page.finish('insights')
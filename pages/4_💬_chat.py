@@ -1,9 +1,17 @@
 import streamlit as st
-from llama_index import VectorStoreIndex, ServiceContext, Document
-from llama_index.llms import OpenAI
-import openai
-from llama_index import SimpleDirectoryReader
 import os
+from lazy import lazy
+from chat.answer_cache import AnswerCache
+from diagnostics import panel, spans
+
+# llama_index takes seconds to import: it is loaded by the first use below,
+# once the title and the spinner are on screen
+llms = lazy('llama_index.llms')
+index_store = lazy('chat.index_store')
+embeddings = lazy('chat.embeddings')
+display = lazy('chat.display')
+memory = lazy('chat.memory')
+streaming = lazy('chat.streaming')
 
 # Read AWS Credentials from Environment Variable
 if "openai_key" not in st.session_state:
@@ -20,11 +28,14 @@ if "messages" not in st.session_state.keys(): # Initialize the chat messages his
 
 @st.cache_resource(show_spinner=False)
 def load_data():
-    with st.spinner(text="Carregando informações. Isso pode demorar alguns minutos..."):
-        reader = SimpleDirectoryReader(input_dir="./magalu", recursive=True)
-        docs = reader.load_data()
-        service_context = ServiceContext.from_defaults(
-            llm=OpenAI(
+    with st.spinner(text="Carregando informações. Isso pode demorar alguns minutos..."), spans.span('chat.index_load'):
+        # Index kept on disk, rebuilt only when the files in ./magalu change
+        index = index_store.load_or_build(
+            "chat",
+            "./magalu",
+            embed_model=embeddings.embed_model(),
+            chunk_size=1024,
+            llm=llms.OpenAI(
                 model="gpt-3.5-turbo", 
                 temperature=0.5, 
                 system_prompt="O Magazine Luiza, também conhecido como MAGALU, é uma empresa brasileira do setor do varejo multicanal.\
@@ -36,26 +47,47 @@ def load_data():
                     Este balanço financeiro foi elaborado pela empresa de consultoria ERNST & YOUNG Auditores Independentes S/S Ltda. \
                     Limite suas respostas em linguagem financeira e baseada em fatos.– não alucine.")
             )
-        index = VectorStoreIndex.from_documents(docs, service_context=service_context)
         return index
 
 index = load_data()
 
+# Answers shared by every session, dropped whenever the index changes
+@st.cache_resource(show_spinner=False)
+def load_answer_cache():
+    return AnswerCache(index.service_context.embed_model)
+
+answer_cache = load_answer_cache()
+answer_cache.validate(index_store.index_digest("chat"))
+cache_stats = answer_cache.stats()
+st.sidebar.caption(
+    f"Cache de respostas: {cache_stats['exact_hits']} idênticas, {cache_stats['similar_hits']} similares, "
+    f"{cache_stats['misses']} novas ({cache_stats['size']} guardadas)"
+)
+
 if "chat_engine" not in st.session_state.keys(): # Initialize the chat engine
-        st.session_state.chat_engine = index.as_chat_engine(chat_mode="condense_question", verbose=True)
+        st.session_state.chat_engine = streaming.StreamingChatEngine(index, answer_cache=answer_cache)
 
 if prompt := st.chat_input("Sua pergunta"): # Prompt for user input and save to chat history
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-for message in st.session_state.messages: # Display the prior chat messages
-    with st.chat_message(message["role"]):
-        st.write(message["content"])
+st.session_state.messages = memory.trim_messages(st.session_state.messages)
+display.render_history(st.session_state.messages) # Display the prior chat messages
 
 # If last message is not from assistant, generate a new response
 if st.session_state.messages[-1]["role"] != "assistant":
     with st.chat_message("assistant"):
+        # Tokens are written as they arrive
+        chat_engine = st.session_state.chat_engine
         with st.spinner("Thinking..."):
-            response = st.session_state.chat_engine.chat(prompt)
-            st.write(response.response)
-            message = {"role": "assistant", "content": response.response}
-            st.session_state.messages.append(message) # Add response to message history
+            answer = st.write_stream(chat_engine.stream_chat(prompt))
+        message = {
+            "role": "assistant",
+            "content": answer,
+            "first_token_seconds": chat_engine.first_token_seconds,
+            "total_seconds": chat_engine.total_seconds,
+            "cache_hit": chat_engine.cache_hit,
+        }
+        st.caption(display.timing(message))
+        st.session_state.messages.append(message) # Add response to message history
+
+panel.sidebar()
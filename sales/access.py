@@ -0,0 +1,203 @@
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sales import pinot, queries, incremental, config, schema
+from sales.incremental import ROW_COLUMNS
+from sales.queries import GROUP_LIMIT, TABLE, select_list
+from diagnostics import spans
+
+# Data access modes offered by the pages
+MODES = {
+    'exact': 'Exact aggregates (server-side)',
+    'incremental': 'Exact, incremental refresh',
+    'sample': 'Random sample',
+    'paged': 'Paged full scan',
+}
+
+# Engine the exact numbers come from, for the chart captions
+ENGINE = {'pinot': 'Pinot', 'embedded': 'DuckDB'}.get(config.BACKEND, config.BACKEND)
+
+# Numbers that stay exact in sample mode, they are cheap to aggregate on the broker
+EXACT_IN_SAMPLE = ['kpis']
+
+# Data loaded on first use and again once older than CACHE_TTL or
+# invalidated; each source implements reload, describe and aggregate
+class CachedSource():
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_at = None
+
+    def load(self):
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at > config.CACHE_TTL:
+                self.reload()
+                self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    # Changes whenever the data is loaded again
+    def version(self):
+        self.load()
+        return (self.loaded_at)
+
+# Every aggregation computed by the Pinot broker over the whole table, also
+# grouped by the filter columns. All of them are fetched together and kept
+# for CACHE_TTL seconds as rollup cubes, so any page and any selection is
+# answered from the same frames. Aggregations with more groups than a query returns are
+# filtered by Pinot instead. New events only add groups, so once over the
+# limit an aggregation stays with Pinot and its partial is not fetched again.
+class ExactAggregates(CachedSource):
+
+    def __init__(self):
+        super().__init__()
+        self.cubes = {}
+        self.server_side = set()
+
+    def fetch_partial(self, name):
+        partial_df = pinot.fetch(incremental.partial_sql(name), {}, incremental.partial_columns(name))
+        if len(partial_df) >= GROUP_LIMIT:
+            return (None)
+        keys = incremental.partial_keys(name)
+        return (schema.apply(partial_df, keys).set_index(keys))
+
+    @spans.timed('exact.load')
+    def reload(self):
+        names = [name for name in queries.AGGREGATIONS if name not in self.server_side]
+        with ThreadPoolExecutor(config.PINOT_POOL_SIZE) as executor:
+            partials = dict(zip(names, executor.map(self.fetch_partial, names)))
+        self.server_side |= {name for name, partial in partials.items() if partial is None}
+        self.cubes = incremental.build_cubes({name: p for name, p in partials.items() if p is not None})
+
+    def describe(self, name):
+        return (f'Exact, computed by {ENGINE}')
+
+    def aggregate(self, name, filters=None):
+        self.load()
+        if name in self.server_side:
+            return (queries.aggregate(name, filters))
+        return (self.cubes[name].answer(filters))
+
+# Distribution charts from a uniform sample of the table, KPIs stay exact
+class SampledAggregates(CachedSource):
+
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+        self.cubes = {}
+        self.rows = 0
+        self.events = 0
+
+    # Systematic sample over customer_id with a random start: one row out of
+    # every step, so every row has the same chance of being drawn
+    def fetch_sample(self):
+        count_df = pinot.fetch(f'SELECT COUNT(*) AS "events" FROM {TABLE}', {}, ['events'])
+        self.events = int(count_df['events'].iloc[0])
+        step = max(1, math.ceil(self.events / self.size))
+        sql = f'''SELECT {select_list(ROW_COLUMNS)} FROM {TABLE}
+            WHERE MOD("customer_id", {step}) = {random.randrange(step)} LIMIT {self.size}'''
+        return (pinot.fetch_rows(sql, {}, ROW_COLUMNS))
+
+    @spans.timed('sample.load')
+    def reload(self):
+        sample_df = self.fetch_sample()
+        partials = {}
+        incremental.add_rows(partials, sample_df)
+        self.cubes = incremental.build_cubes(partials)
+        self.rows = len(sample_df)
+
+    def describe(self, name):
+        if name in EXACT_IN_SAMPLE:
+            return (f'Exact, computed by {ENGINE}')
+        return (f'Estimated from a random sample of {self.rows:,} events')
+
+    def aggregate(self, name, filters=None):
+        if name in EXACT_IN_SAMPLE:
+            return (queries.aggregate(name, filters))
+        self.load()
+        rollup = self.cubes.get(name)
+        if rollup is None:
+            return (queries.empty_result(name))
+        sample_df = rollup.answer(filters)
+        # Counts and sums scaled up from the sample to the whole table
+        scale = self.events / self.rows if self.rows else 0
+        for func, _, alias in queries.AGGREGATIONS[name][1]:
+            if func in ('COUNT', 'SUM'):
+                sample_df[alias] = sample_df[alias] * scale
+        return (sample_df)
+
+# Whole table streamed page by page into the pandas aggregations, only one
+# page and the running aggregates are held in memory
+class PagedAggregates(CachedSource):
+
+    def __init__(self, page_size):
+        super().__init__()
+        self.page_size = page_size
+        self.cubes = {}
+        self.rows = 0
+
+    def pages(self):
+        last_id = -1
+        while True:
+            sql = f'''SELECT {select_list(ROW_COLUMNS)} FROM {TABLE}
+                WHERE "customer_id" > %(last_id)s
+                ORDER BY "customer_id" LIMIT {self.page_size}'''
+            page_df = pinot.fetch_rows(sql, {'last_id': int(last_id)}, ROW_COLUMNS)
+            if page_df.empty:
+                return
+            yield page_df
+            if len(page_df) < self.page_size:
+                return
+            last_id = page_df['customer_id'].max()
+
+    @spans.timed('paged.load')
+    def reload(self):
+        partials = {}
+        rows = 0
+        for page_df in self.pages():
+            incremental.add_rows(partials, page_df)
+            rows += len(page_df)
+        self.cubes = incremental.build_cubes(partials)
+        self.rows = rows
+
+    def describe(self, name):
+        return (f'Exact, paged scan of {self.rows:,} events')
+
+    def aggregate(self, name, filters=None):
+        self.load()
+        rollup = self.cubes.get(name)
+        if rollup is None:
+            return (queries.empty_result(name))
+        return (rollup.answer(filters))
+
+exact = ExactAggregates()
+paged = PagedAggregates(config.PAGE_SIZE)
+samples = {}
+
+# Data source for the pages in the given mode
+def source(mode, sample_size=config.SAMPLE_SIZE):
+    if mode == 'incremental':
+        incremental.loader.refresh()
+        return (incremental.loader)
+    if mode == 'sample':
+        # One sample per allowed size at most, other sizes use the closest one
+        sample_size = min(config.SAMPLE_SIZES, key=lambda size: abs(size - sample_size))
+        if sample_size not in samples:
+            samples[sample_size] = SampledAggregates(sample_size)
+        return (samples[sample_size])
+    if mode == 'paged':
+        return (paged)
+    return (exact)
+
+# New events arrived: drop everything that was computed before them
+def invalidate():
+    pinot.result_cache.clear()
+    if incremental.loader.watermark >= 0:
+        incremental.loader.refresh()
+    exact.invalidate()
+    paged.invalidate()
+    for sample in samples.values():
+        sample.invalidate()
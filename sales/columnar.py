@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from sales import schema
+
+FLAG_TRUE = set(schema.FLAG_TRUE)
+
+# Categorical column built from integer codes, the strings of a chunk are
+# factorized and mapped onto the categories seen so far
+class CategoryColumn():
+
+    def __init__(self):
+        self.categories = {}
+        self.codes = []
+
+    def add(self, values):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        mapping = np.array(
+            [self.categories.setdefault(value, len(self.categories)) for value in uniques] + [-1],
+            dtype=np.int32
+        )
+        # Missing values come back as -1, which picks the -1 at the end of mapping
+        self.codes.append(mapping[codes])
+
+    def array(self):
+        codes, self.codes = self.codes, []
+        return (pd.Categorical.from_codes(np.concatenate(codes), categories=list(self.categories)))
+
+# Plain NumPy column, flags converted to booleans
+class ArrayColumn():
+
+    def __init__(self, column):
+        self.column = column
+        self.chunks = []
+
+    def add(self, values):
+        if self.column in schema.FLAG_COLUMNS:
+            self.chunks.append(np.fromiter(map(FLAG_TRUE.__contains__, values), dtype=bool, count=len(values)))
+        else:
+            self.chunks.append(np.asarray(values, dtype=schema.NUMERIC_TYPES.get(self.column, object)))
+
+    def array(self):
+        chunks, self.chunks = self.chunks, []
+        return (np.concatenate(chunks))
+
+# Typed DataFrame read from a cursor chunk by chunk: each chunk of row tuples
+# is turned into column arrays and dropped, so the rows are never held as a
+# whole list of tuples next to the frame
+def read_frame(curs, columns, chunk_size):
+    builders = [CategoryColumn() if column in schema.CATEGORY_COLUMNS else ArrayColumn(column)
+        for column in columns]
+    rows = curs.fetchmany(chunk_size)
+    if not rows:
+        return (schema.apply(pd.DataFrame(columns=columns)))
+    while rows:
+        for builder, values in zip(builders, zip(*rows)):
+            builder.add(values)
+        rows = curs.fetchmany(chunk_size)
+    # Each column drops its chunks once joined, keeping the peak near the frame size
+    arrays = {}
+    for column, builder in zip(columns, builders):
+        arrays[column] = builder.array()
+    return (pd.DataFrame(arrays, copy=False))
@@ -0,0 +1,54 @@
+import os
+
+# Backend answering the queries: 'pinot', the broker below, or 'embedded',
+# DuckDB over a Parquet copy of LOCAL_FILES kept in PARQUET_DIR, for runs
+# without a Pinot cluster
+BACKEND = os.environ.get('SALES_BACKEND', 'pinot')
+LOCAL_FILES = os.environ.get('SALES_LOCAL_FILES', './data/shopping_trends_updated_batch.json').split(os.pathsep)
+PARQUET_DIR = os.environ.get('SALES_PARQUET_DIR', './data/parquet')
+
+# Pinot broker
+PINOT_HOST = os.environ.get('PINOT_HOST', 'localhost')
+PINOT_PORT = int(os.environ.get('PINOT_PORT', 8000))
+PINOT_PATH = os.environ.get('PINOT_PATH', '/query/sql')
+PINOT_SCHEME = os.environ.get('PINOT_SCHEME', 'http')
+
+# Connections shared by all sessions of the process
+PINOT_POOL_SIZE = int(os.environ.get('PINOT_POOL_SIZE', 4))
+
+# Query results are reused for CACHE_TTL seconds, at most CACHE_SIZE entries
+CACHE_TTL = float(os.environ.get('SALES_CACHE_TTL', 30))
+CACHE_SIZE = int(os.environ.get('SALES_CACHE_SIZE', 256))
+
+# Rows converted to column arrays at a time when reading transaction rows
+FETCH_CHUNK_SIZE = int(os.environ.get('SALES_FETCH_CHUNK_SIZE', 10000))
+
+# Plotly figures kept for reuse across reruns and sessions, see sales/figures.py
+FIGURE_CACHE_SIZE = int(os.environ.get('SALES_FIGURE_CACHE_SIZE', 128))
+
+# Default data access mode of the pages, see sales/access.py
+DATA_MODE = os.environ.get('SALES_DATA_MODE', 'exact')
+
+# Incremental refresh: only events newer than the last purchase_time seen are
+# fetched, INCREMENTAL_PAGE_SIZE rows per query
+INCREMENTAL_PAGE_SIZE = int(os.environ.get('SALES_INCREMENTAL_PAGE_SIZE', 50000))
+
+# Sample mode: rows drawn for the distribution charts, the default and the
+# sizes offered; each size keeps its own sample in memory
+SAMPLE_SIZE = int(os.environ.get('SALES_SAMPLE_SIZE', 10000))
+SAMPLE_SIZES = sorted({1000, 10000, 100000, 1000000, SAMPLE_SIZE})
+
+# Paged mode: rows per page while scanning the whole table
+PAGE_SIZE = int(os.environ.get('SALES_PAGE_SIZE', 50000))
+
+# Live mode polls for new events every LIVE_INTERVAL seconds by default
+LIVE_INTERVAL = int(os.environ.get('SALES_LIVE_INTERVAL', 5))
+
+# Sales page map: the folium view is off by default, its geometry is read
+# from STATES_GEOJSON, a GeoJSON of US states with abbreviations as ids
+# Its packages are optional, listed in requirements-map.txt
+FOLIUM_MAP = os.environ.get('SALES_FOLIUM_MAP', '') not in ('', '0', 'false')
+STATES_GEOJSON = os.environ.get(
+    'SALES_STATES_GEOJSON',
+    'https://raw.githubusercontent.com/python-visualization/folium/main/examples/data/us-states.json'
+)
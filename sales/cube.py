@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from sales import queries, schema
+from sales.queries import AGGREGATIONS
+from diagnostics import spans
+
+# One aggregation as a dense array: an axis per filter dimension, one for the
+# groups of the chart and one for the metric parts (sums and counts). Built
+# once per data refresh from the running partial; a selection is answered by
+# taking the selected members of each filter axis and summing them away, so
+# its cost depends on the cube size and not on the number of events. Filter
+# columns the chart also groups by select groups instead of having an axis.
+class RollupCube():
+
+    def __init__(self, partial, name, dimensions):
+        self.name = name
+        group_by, metrics = AGGREGATIONS[name]
+        self.dimensions = [column for column in dimensions if column not in group_by]
+        self.parts = list(partial.columns)
+        self.counts = [alias for func, _, alias in metrics if func == 'COUNT'] + \
+            [f'{alias}__count' for func, _, alias in metrics if func == 'AVG']
+        index = partial.index
+        codes = []
+        self.members = []
+        for column in self.dimensions:
+            column_codes, members = pd.factorize(index.get_level_values(column))
+            codes.append(column_codes)
+            self.members.append(pd.Index(members))
+        if group_by:
+            group_codes, groups = pd.factorize(pd.MultiIndex.from_arrays([index.get_level_values(c) for c in group_by]))
+            self.groups = groups.to_frame(index=False, name=group_by)
+        else:
+            group_codes, self.groups = np.zeros(len(index), dtype=np.intp), None
+        # Last part counts the partial rows in each cell, so groups absent from
+        # a selection can be told apart from groups adding up to zero
+        values = np.column_stack([partial.to_numpy(dtype=np.float64), np.ones(len(index))])
+        shape = [len(m) for m in self.members] + [len(self.groups) if group_by else 1, values.shape[1]]
+        self.cells = np.zeros(shape)
+        self.cells[tuple(codes) + (group_codes,)] = values
+
+    # Same shape as queries.aggregate for {column: [values]} filters
+    @spans.timed('cube.answer')
+    def answer(self, filters=None):
+        group_by, metrics = AGGREGATIONS[self.name]
+        cells = self.cells
+        for axis, column in enumerate(self.dimensions):
+            if filters and column in filters:
+                positions = self.members[axis].get_indexer(list(filters[column]))
+                cells = cells.take(positions[positions >= 0], axis=axis)
+        totals = cells.sum(axis=tuple(range(len(self.dimensions))))
+        present = totals[:, -1] > 0
+        for column, values in (filters or {}).items():
+            if column in group_by:
+                present &= self.groups[column].isin(list(values)).to_numpy()
+        if not present.any():
+            return (queries.empty_result(self.name))
+        totals_df = pd.DataFrame(totals[present, :-1], columns=self.parts)
+        totals_df[self.counts] = totals_df[self.counts].astype(np.int64)
+        if group_by:
+            groups_df = schema.apply(self.groups[present].reset_index(drop=True), group_by)
+            totals_df = pd.concat([groups_df, totals_df], axis=1)
+        for func, _, alias in metrics:
+            if func == 'AVG':
+                totals_df[alias] = totals_df[f'{alias}__sum'] / totals_df[f'{alias}__count']
+        return (totals_df[queries.aggregate_columns(self.name)])
+
+# Cubes of every aggregation with a running partial
+def build(partials, dimensions):
+    return ({name: RollupCube(partial, name, dimensions) for name, partial in partials.items()})
@@ -0,0 +1,67 @@
+import streamlit as st
+from sales import access, config
+from sales.schema import PRODUCT_ITEMS, PAY_METHODS, SEASONS, currency
+from diagnostics import spans
+
+# Selections and settings shared by every page of a session
+SESSION_DEFAULTS = {
+    'selected_items': PRODUCT_ITEMS,
+    'pay_methods': PAY_METHODS,
+    'seasons': SEASONS,
+    'data_mode': config.DATA_MODE,
+    'sample_size': config.SAMPLE_SIZE,
+}
+
+# Aggregated frames a session keeps for its latest selections
+SESSION_FRAMES = 64
+
+def init_session():
+    for key, value in SESSION_DEFAULTS.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+
+# Aggregations of one page for its filters. The frames come from the data
+# source chosen in the sidebar, shared by every session of the process; the
+# session keeps the answers it got until the source fetches new data, so
+# reruns and page switches with the same selection skip even the masking.
+class SalesData():
+
+    def __init__(self, filters):
+        self.filters = filters
+        self.mode = st.session_state['data_mode']
+        self.sample_size = st.session_state['sample_size']
+        self.source = access.source(self.mode, self.sample_size)
+        self.frames = st.session_state.setdefault('sales_frames', {})
+
+    def key(self, name):
+        filters = tuple(sorted((column, tuple(sorted(values))) for column, values in self.filters.items()))
+        return ((self.mode, self.sample_size, name, filters))
+
+    # How the numbers of an aggregation were produced
+    def describe(self, name):
+        return (self.source.describe(name))
+
+    # Aggregated rows for the selection, a copy the page may change
+    @spans.timed('data.aggregate')
+    def aggregate(self, name):
+        key = self.key(name)
+        version = self.source.version()
+        if key in self.frames and self.frames[key][0] == version:
+            return (self.frames[key][1].copy())
+        frame = self.source.aggregate(name, self.filters)
+        self.frames.pop(key, None)
+        self.frames[key] = (version, frame)
+        while len(self.frames) > SESSION_FRAMES:
+            self.frames.pop(next(iter(self.frames)))
+        return (frame.copy())
+
+    # Total revenue, average rating and total customers
+    def kpis(self):
+        kpis = self.aggregate('kpis')
+        with spans.span('format.currency'):
+            total_revenue = currency(kpis['total_revenue'].sum())
+        return (
+            total_revenue,
+            round(kpis['avg_rating'].fillna(0).sum(), 3),
+            int(kpis['total_customers'].sum()),
+        )
@@ -0,0 +1,158 @@
+import glob
+import json
+import os
+import re
+import threading
+import duckdb
+import pandas as pd
+from sales import config
+from sales.schema import SALES_COLUMNS
+
+# Embedded stand-in for the Pinot broker: the local data files are converted
+# once into a Parquet file holding only the SalesTxs columns, and DuckDB runs
+# the same SQL the pages send to Pinot on it, reading just the columns and
+# row groups a query needs
+
+TABLE = 'SalesTxs'
+
+# Events appended while the app runs, kept in memory only
+EVENTS_TABLE = 'SalesTxsEvents'
+
+# Column types of the Pinot table, VARCHAR for the rest
+COLUMN_TYPES = {
+    'age': 'INTEGER',
+    'customer_id': 'INTEGER',
+    'previous_purchases': 'INTEGER',
+    'purchase_amount_usd': 'DOUBLE',
+    'review_rating': 'DOUBLE',
+    'purchase_time': 'BIGINT',
+}
+
+# pinotdb parameters, %(name)s, become DuckDB named parameters, $name
+PARAMETER = re.compile(r'%\((\w+)\)s')
+
+def parquet_path():
+    return (os.path.join(config.PARQUET_DIR, f'{TABLE}.parquet'))
+
+# What a Parquet file was converted from, kept next to it
+def manifest_path(target):
+    return (f'{target}.manifest.json')
+
+# Reader of one source: JSON lines, CSV with headers like "Purchase Amount
+# (USD)", which DuckDB normalizes to purchase_amount_usd, a Parquet file or
+# a directory of Parquet parts
+def reader(path):
+    escaped = path.replace("'", "''")
+    if os.path.isdir(path):
+        return (f"read_parquet('{os.path.join(escaped, '*.parquet')}')")
+    if path.endswith('.parquet'):
+        return (f"read_parquet('{escaped}')")
+    if path.endswith('.csv'):
+        return (f"read_csv_auto('{escaped}', normalize_names = true)")
+    return (f"read_json_auto('{escaped}', format = 'newline_delimited')")
+
+# The SalesTxs columns of a source file, typed; events without a
+# purchase_time get 0
+def source_select(conn, path):
+    present = {row[0] for row in conn.execute(f'DESCRIBE SELECT * FROM {reader(path)}').fetchall()}
+    columns = []
+    for column in SALES_COLUMNS:
+        value = f'"{column}"' if column in present else 'NULL'
+        if column == 'purchase_time':
+            value = f'COALESCE({value}, 0)'
+        columns.append(f'CAST({value} AS {COLUMN_TYPES.get(column, "VARCHAR")}) AS "{column}"')
+    return (f'SELECT {", ".join(columns)} FROM {reader(path)}')
+
+# Every file a source reads, with its size and modification time
+def source_files(path):
+    files = sorted(glob.glob(os.path.join(path, '*.parquet'))) if os.path.isdir(path) else [path]
+    return ([[os.path.abspath(file), os.path.getsize(file), os.path.getmtime(file)] for file in files])
+
+def read_manifest(target):
+    try:
+        with open(manifest_path(target)) as f:
+            return (json.load(f))
+    except (OSError, ValueError):
+        return (None)
+
+# Converts the source files, unless the Parquet file was converted from the
+# same files, unchanged, with the same columns
+def convert(paths, target):
+    manifest = {'columns': SALES_COLUMNS, 'sources': [source_files(path) for path in paths]}
+    if os.path.exists(target) and read_manifest(target) == manifest:
+        return (False)
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    # Written aside and moved in place, so another process never reads half a file
+    partial = f'{target}.{os.getpid()}'
+    conn = duckdb.connect()
+    try:
+        select = ' UNION ALL '.join(source_select(conn, path) for path in paths)
+        conn.execute(f"COPY ({select} ORDER BY \"customer_id\") TO '{partial}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    finally:
+        conn.close()
+    with open(f'{partial}.manifest', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(partial, target)
+    os.replace(f'{partial}.manifest', manifest_path(target))
+    return (True)
+
+# In-memory DuckDB database with SalesTxs as a view on the Parquet file and
+# on the events appended since, the stand-in for a realtime table
+class Database():
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def open(self):
+        with self.lock:
+            if self.conn is None:
+                target = parquet_path()
+                convert(config.LOCAL_FILES, target)
+                conn = duckdb.connect()
+                conn.execute(f"CREATE TABLE {EVENTS_TABLE} AS SELECT * FROM read_parquet('{target}') LIMIT 0")
+                conn.execute(f'''CREATE VIEW {TABLE} AS SELECT * FROM read_parquet('{target}')
+                    UNION ALL SELECT * FROM {EVENTS_TABLE}''')
+                self.conn = conn
+            return (self.conn)
+
+    # Events as the online file holds them, missing columns as NULL
+    def append(self, events):
+        events_df = pd.DataFrame([[event.get(c) for c in SALES_COLUMNS] for event in events], columns=SALES_COLUMNS)
+        curs = self.open().cursor()
+        try:
+            curs.register('events_df', events_df)
+            curs.execute(f'INSERT INTO {EVENTS_TABLE} SELECT * FROM events_df')
+        finally:
+            curs.close()
+
+database = Database()
+
+# DB-API cursor with pinotdb's parameter style, one DuckDB cursor per use so
+# threads do not share one
+class Cursor():
+
+    def __init__(self, curs):
+        self.curs = curs
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.curs.execute(PARAMETER.sub(r'$\1', sql), params or None)
+        self.description = self.curs.description
+
+    def fetchall(self):
+        return (self.curs.fetchall())
+
+    def fetchmany(self, size):
+        return (self.curs.fetchmany(size))
+
+class Connection():
+
+    def cursor(self):
+        return (Cursor(database.open().cursor()))
+
+    def close(self):
+        pass
+
+def connect(**connect_args):
+    return (Connection())
@@ -0,0 +1,22 @@
+import pandas as pd
+from sales import config
+from sales.pinot import ResultCache
+from diagnostics import spans
+
+# Figures shared by every session of the process, least recently used first
+# out. A figure never goes stale: new data means a new fingerprint
+figure_cache = ResultCache(float('inf'), config.FIGURE_CACHE_SIZE)
+
+def fingerprint(data):
+    return ((tuple(data.columns), pd.util.hash_pandas_object(data).values.tobytes()))
+
+# Figure of a chart for its aggregated data and layout options, built by
+# build(data, **options) only when no session has drawn the same one yet. A
+# filter change then rebuilds just the charts whose aggregate it changed
+def figure(name, data, build, **options):
+    key = (name, fingerprint(data), tuple(sorted(options.items())))
+    return (figure_cache.get_or_load(key, lambda: build_figure(build, data, options)))
+
+def build_figure(build, data, options):
+    with spans.span('figure.build'):
+        return (build(data, **options))
@@ -0,0 +1,57 @@
+import functools
+import json
+import numpy as np
+import pandas as pd
+from sales import config
+
+STATES_FILE = './data/us_json.json'
+
+US_LAT_CENTER = 47.751076
+US_LON_CENTER = -120.740135
+
+# State names and their abbreviations, read once per process. The names are
+# the categories locations are coded against, the abbreviations are indexed
+# by the same codes
+@functools.lru_cache(maxsize=None)
+def states():
+    with open(STATES_FILE) as f:
+        records = json.load(f)
+    names = pd.Index([r['name'] for r in records])
+    abbreviations = np.array([r['abbreviation'] for r in records], dtype=object)
+    return (names, abbreviations)
+
+# Code of each location in states(), -1 for places that are not a state. A
+# categorical location only looks up its categories, not every row
+def state_codes(location):
+    names, _ = states()
+    if isinstance(location.dtype, pd.CategoricalDtype):
+        category_codes = np.append(names.get_indexer(location.cat.categories), -1)
+        return (category_codes[location.cat.codes.to_numpy()])
+    return (names.get_indexer(location))
+
+# Revenue per state abbreviation in one pass: locations are coded against
+# the states and the amounts summed by code
+def revenue_by_state(sales_location, value='purchase_amount_usd'):
+    _, abbreviations = states()
+    codes = state_codes(sales_location['location'])
+    known = codes >= 0
+    totals = np.bincount(codes[known], weights=sales_location[value].to_numpy(dtype=np.float64)[known], minlength=len(abbreviations))
+    present = np.bincount(codes[known], minlength=len(abbreviations)) > 0
+    return (pd.DataFrame({'abbreviation': abbreviations[present], value: totals[present]}))
+
+# Folium choropleth of the same data, only built when SALES_FOLIUM_MAP is set;
+# folium and streamlit_folium are imported here so the page does not pay for
+# them otherwise
+def folium_view(state_revenue, value='purchase_amount_usd'):
+    import folium
+    from streamlit_folium import folium_static
+    sales_map = folium.Map(location=(US_LAT_CENTER, US_LON_CENTER), zoom_start=4, tiles="cartodb positron")
+    folium.Choropleth(
+        geo_data=config.STATES_GEOJSON,
+        data=state_revenue,
+        columns=['abbreviation', value],
+        key_on='feature.id',
+        fill_color='Reds',
+        legend_name='USD',
+    ).add_to(sales_map)
+    folium_static(sales_map)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+# Bin widths a histogram picks from, times a power of ten
+NICE_STEPS = [1, 2, 2.5, 5, 10]
+
+# Smallest round width that splits span into at most nbins bins; integer
+# columns keep whole widths so every bin holds the same number of values
+def bin_width(span, nbins, integer=False):
+    raw = span / nbins if span > 0 else 1
+    magnitude = 10 ** np.floor(np.log10(raw))
+    for step in NICE_STEPS:
+        width = step * magnitude
+        if width >= raw and (not integer or (width >= 1 and float(width).is_integer())):
+            return (width)
+    return (10 * magnitude)
+
+# Binned counts of a numeric column from its per-value counts, as returned
+# by a GROUP BY on the column: the bars of a histogram without the raw
+# values, so the chart size does not depend on the number of transactions.
+# Bins include their start and exclude their end
+def binned(counts_df, column, weight, nbins=20):
+    values = counts_df[column].to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        return (pd.DataFrame({'start': [], 'end': [], 'center': [], weight: []}, dtype=np.float64))
+    integer = pd.api.types.is_integer_dtype(counts_df[column])
+    width = bin_width(values.max() - values.min(), nbins, integer)
+    first = np.floor(values.min() / width) * width
+    # Rounded first, so 3.0 / 0.2 lands in bin 15 and not 14.999...
+    positions = np.floor(np.round((values - first) / width, 9)).astype(np.intp)
+    totals = np.bincount(positions, weights=counts_df[weight].to_numpy(dtype=np.float64))
+    starts = np.round(first + width * np.arange(len(totals)), 9)
+    return (pd.DataFrame({
+        'start': starts,
+        'end': starts + width,
+        'center': starts + width / 2,
+        weight: totals.astype(np.int64) if pd.api.types.is_integer_dtype(counts_df[weight]) else totals,
+    }))
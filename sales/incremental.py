@@ -0,0 +1,133 @@
+import threading
+from sales import pinot, queries, config, cube
+from sales.queries import AGGREGATIONS, GROUP_LIMIT, TABLE, quote, select_list
+from sales.schema import SALES_COLUMNS
+from diagnostics import spans
+
+# Columns the pages filter on, kept in every running aggregate
+FILTER_COLUMNS = ['item_purchased', 'payment_method', 'season']
+
+# Columns the running aggregates read, the only ones fetched with the rows
+def row_columns(names=AGGREGATIONS):
+    columns = set(FILTER_COLUMNS) | {'customer_id', 'purchase_time'}
+    for name in names:
+        group_by, metrics = AGGREGATIONS[name]
+        columns.update(group_by)
+        columns.update(column for _, column, _ in metrics if column != '*')
+    return ([c for c in SALES_COLUMNS if c in columns])
+
+ROW_COLUMNS = row_columns()
+
+# Mergeable parts of a metric: AVG is kept as a sum and a count
+def metric_parts(func, column, alias):
+    if func == 'COUNT':
+        return ([(alias, 'customer_id', 'count')])
+    if func == 'SUM':
+        return ([(alias, column, 'sum')])
+    return ([(f'{alias}__sum', column, 'sum'), (f'{alias}__count', column, 'count')])
+
+def partial_keys(name):
+    group_by, _ = AGGREGATIONS[name]
+    return (FILTER_COLUMNS + [c for c in group_by if c not in FILTER_COLUMNS])
+
+# Aggregate a batch of rows, keyed by filter and group columns
+def partial_aggregate(df, name):
+    _, metrics = AGGREGATIONS[name]
+    parts = [part for metric in metrics for part in metric_parts(*metric)]
+    return (df.groupby(partial_keys(name), observed=True).agg(
+        **{alias: (column, how) for alias, column, how in parts}))
+
+def partial_columns(name):
+    _, metrics = AGGREGATIONS[name]
+    return (partial_keys(name) + [alias for metric in metrics for alias, _, _ in metric_parts(*metric)])
+
+# Same partial computed by Pinot over the whole table
+def partial_sql(name):
+    _, metrics = AGGREGATIONS[name]
+    keys = partial_keys(name)
+    select = [quote(c) for c in keys]
+    for func, column, alias in metrics:
+        for part_alias, _, how in metric_parts(func, column, alias):
+            select.append(f'COUNT(*) AS {quote(part_alias)}' if how == 'count' else f'SUM({quote(column)}) AS {quote(part_alias)}')
+    return (f'SELECT {", ".join(select)} FROM {TABLE} GROUP BY {select_list(keys)} LIMIT {GROUP_LIMIT}')
+
+# Rollup cubes of the running partials, answering any filter selection
+@spans.timed('cube.build')
+def build_cubes(partials):
+    return (cube.build(partials, FILTER_COLUMNS))
+
+# Add a batch of rows to the running aggregates of every page aggregation
+@spans.timed('partials.aggregate')
+def add_rows(partials, df):
+    for name in AGGREGATIONS:
+        new_partial = partial_aggregate(df, name)
+        if name in partials:
+            new_partial = partials[name].add(new_partial, fill_value=0)
+        partials[name] = new_partial
+
+# Running aggregates, advanced by the events newer than the highest
+# purchase_time seen so far. The rows themselves are dropped once merged,
+# so memory follows the number of groups, not the length of the stream
+class IncrementalLoader():
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.watermark = -1
+        self.partials = {}
+        self.cubes = {}
+
+    def fetch_since(self, watermark, limit):
+        sql = f'''SELECT {select_list(ROW_COLUMNS)} FROM {TABLE}
+            WHERE "purchase_time" > %(watermark)s
+            ORDER BY "purchase_time" LIMIT {limit}'''
+        return (pinot.fetch_rows(sql, {'watermark': int(watermark)}, ROW_COLUMNS))
+
+    def fetch_at(self, purchase_time):
+        sql = f'''SELECT {select_list(ROW_COLUMNS)} FROM {TABLE}
+            WHERE "purchase_time" = %(purchase_time)s LIMIT {queries.GROUP_LIMIT}'''
+        return (pinot.fetch_rows(sql, {'purchase_time': int(purchase_time)}, ROW_COLUMNS))
+
+    def merge(self, new_df):
+        self.rows += len(new_df)
+        add_rows(self.partials, new_df)
+        self.watermark = new_df['purchase_time'].max()
+
+    # Fetch and merge new events, returns how many arrived
+    @spans.timed('incremental.refresh')
+    def refresh(self):
+        with self.lock:
+            new_rows = 0
+            while True:
+                new_df = self.fetch_since(self.watermark, self.page_size)
+                if new_df.empty:
+                    break
+                if len(new_df) == self.page_size:
+                    # A full page may cut a purchase_time in half: keep the last
+                    # timestamp for the next page, or read it whole if it fills the page
+                    last_time = new_df['purchase_time'].max()
+                    head_df = new_df.loc[new_df['purchase_time'] < last_time]
+                    new_df = head_df if not head_df.empty else self.fetch_at(last_time)
+                self.merge(new_df)
+                new_rows += len(new_df)
+            if new_rows:
+                self.cubes = build_cubes(self.partials)
+            return (new_rows)
+
+    # Changes whenever new events are merged
+    def version(self):
+        return (self.watermark)
+
+    def describe(self, name):
+        return (f'Exact, incremental over {self.rows:,} events')
+
+    def aggregate(self, name, filters=None):
+        with self.lock:
+            rollup = self.cubes.get(name)
+        if rollup is None:
+            return (queries.empty_result(name))
+        return (rollup.answer(filters))
+
+loader = IncrementalLoader(config.INCREMENTAL_PAGE_SIZE)
+
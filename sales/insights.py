@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+# Age ranges of the insights page, lower bound included
+AGE_BINS = [-np.inf, 30, 40, 50, np.inf]
+AGE_RANGES = ['twenties', 'thirties', 'forties', 'senior']
+
+CUBE_DIMENSIONS = ['age_range', 'payment_method', 'frequency_of_purchases']
+
+# Vectorized age bucketing into an ordered categorical
+def age_range(ages):
+    return (pd.cut(ages, bins=AGE_BINS, labels=AGE_RANGES, right=False))
+
+# Customers per age range x payment method x frequency, computed once and
+# summed down to each pair of dimensions the page plots
+class InsightsCube():
+
+    # cube_df has one row per age, payment method and frequency with its customers
+    def __init__(self, cube_df):
+        cube_df = cube_df.assign(age_range=age_range(cube_df['age']))
+        self.customers = cube_df.groupby(CUBE_DIMENSIONS, observed=True)['customers'].sum()
+
+    def marginal(self, dimensions):
+        return (self.customers.groupby(level=dimensions, observed=True).sum().reset_index())
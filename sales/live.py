@@ -0,0 +1,50 @@
+import threading
+import time
+import streamlit as st
+from sales import pinot, access
+from sales.queries import TABLE
+
+# Newest event and row count, changes whenever events arrive
+def probe():
+    version_df = pinot.fetch(
+        f'SELECT MAX("purchase_time") AS "max_time", COUNT(*) AS "events" FROM {TABLE}',
+        {},
+        ['max_time', 'events']
+    )
+    return (tuple(version_df.iloc[0]))
+
+# Process-wide poller shared by every live session
+class LivePoller():
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.last_poll = 0
+
+    # Polls inside the interval, or overlapping a running one, reuse its result
+    def poll(self, interval):
+        if time.monotonic() - self.last_poll < interval:
+            return (self.version)
+        if not self.lock.acquire(blocking=False):
+            return (self.version)
+        try:
+            self.last_poll = time.monotonic()
+            version = probe()
+            if version != self.version:
+                # Something arrived, bring the data up to date
+                access.invalidate()
+                self.version = version
+            return (self.version)
+        finally:
+            self.lock.release()
+
+poller = LivePoller()
+
+def poll_for_changes(interval):
+    if poller.poll(interval) != st.session_state.get('live_version'):
+        st.rerun()
+
+# Reload the page when new events show up, checking every interval seconds
+def watch(interval):
+    st.session_state['live_version'] = poller.poll(interval)
+    st.fragment(poll_for_changes, run_every=interval)(interval)
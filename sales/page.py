@@ -0,0 +1,55 @@
+import locale
+import time
+import streamlit as st
+from sales import access, pinot, live, config, data, figures
+from diagnostics import panel, spans
+
+@st.cache_resource
+def stylesheet():
+    with open("./styles.css") as f:
+        return (f.read())
+
+# Wide layout, stylesheet, locale and session defaults of the dashboard pages
+def setup():
+    st.session_state['run_started'] = time.perf_counter()
+    st.set_page_config(layout="wide")
+    data.init_session()
+    locale.setlocale(locale.LC_ALL, 'en_CA.UTF-8')
+    st.markdown(f"<style>{stylesheet()}</style>", unsafe_allow_html=True)
+
+# Data access mode, and live mode on the pages that offer it
+def sidebar(live_mode=False):
+    data_modes = list(access.MODES)
+    st.session_state['data_mode'] = st.sidebar.selectbox(
+        "Data mode",
+        data_modes,
+        index=data_modes.index(st.session_state['data_mode']),
+        format_func=access.MODES.get
+    )
+    if st.session_state['data_mode'] == 'sample':
+        st.session_state['sample_size'] = st.sidebar.select_slider(
+            "Sample size", config.SAMPLE_SIZES, st.session_state['sample_size'],
+            format_func=lambda size: f'{size:,}'
+        )
+    # Live mode reloads the page when new events arrive
+    if live_mode and st.sidebar.toggle("Live mode", value=False):
+        live_interval = st.sidebar.slider("Refresh every (seconds)", 2, 60, config.LIVE_INTERVAL)
+        live.watch(live_interval)
+
+# Shared query and figure cache counters
+def cache_caption():
+    cache_stats = pinot.result_cache.stats()
+    st.sidebar.caption(f"Query cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    figure_stats = figures.figure_cache.stats()
+    st.sidebar.caption(f"Figure cache: {figure_stats['hits']} hits, {figure_stats['misses']} misses")
+
+# Plotly chart in a column or expander; the time includes serializing the
+# figure for the browser
+def chart(container, fig, key=None):
+    with spans.span('chart.render'):
+        container.plotly_chart(fig, use_container_width=True, key=key)
+
+# Whole run of a page, and the diagnostics sidebar when enabled
+def finish(name):
+    spans.record(f'page.{name}', time.perf_counter() - st.session_state['run_started'])
+    panel.sidebar()
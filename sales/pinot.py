@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+import pandas as pd
+from sales import config, columnar
+from diagnostics import spans
+
+# Connection to the configured backend: the Pinot broker, or the embedded
+# engine over local Parquet files, see sales/embedded.py
+def connect(**connect_args):
+    if config.BACKEND == 'embedded':
+        from sales import embedded
+        return (embedded.connect(**connect_args))
+    import pinotdb
+    return (pinotdb.connect(**connect_args))
+
+# Process-wide pool of Pinot connections
+class ConnectionPool():
+
+    def __init__(self, size, **connect_args):
+        self.connect_args = connect_args
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = LifoQueue()
+
+    @contextmanager
+    def cursor(self):
+        with self.slots:
+            try:
+                conn = self.idle.get_nowait()
+            except Empty:
+                conn = connect(**self.connect_args)
+            try:
+                yield conn.cursor()
+            except Exception:
+                # Do not hand a possibly broken connection to the next caller
+                conn.close()
+                raise
+            self.idle.put(conn)
+
+# Query results with a time to live and LRU eviction
+class ResultCache():
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return (entry[1])
+            self.entries.pop(key, None)
+            self.misses += 1
+            return (None)
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    # Concurrent misses on the same key wait for a single load
+    def get_or_load(self, key, load):
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return (value)
+            with self.lock:
+                event = self.loading.get(key)
+                if event is None:
+                    self.loading[key] = threading.Event()
+                    break
+            event.wait()
+        try:
+            value = load()
+            self.put(key, value)
+            return (value)
+        finally:
+            with self.lock:
+                self.loading.pop(key).set()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return ({'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)})
+
+pool = ConnectionPool(
+    config.PINOT_POOL_SIZE,
+    host=config.PINOT_HOST,
+    port=config.PINOT_PORT,
+    path=config.PINOT_PATH,
+    scheme=config.PINOT_SCHEME
+)
+result_cache = ResultCache(config.CACHE_TTL, config.CACHE_SIZE)
+
+def cache_key(sql, params):
+    return ((' '.join(sql.split()), tuple(sorted((params or {}).items()))))
+
+def fetch(sql, params, columns):
+    with pool.cursor() as curs:
+        with spans.span('pinot.execute'):
+            curs.execute(sql, params)
+            rows = curs.fetchall()
+    with spans.span('frame.build'):
+        return (pd.DataFrame(rows, columns=columns))
+
+# Transaction rows read into typed column arrays
+@spans.timed('pinot.fetch_rows')
+def fetch_rows(sql, params, columns):
+    with pool.cursor() as curs:
+        curs.execute(sql, params)
+        return (columnar.read_frame(curs, columns, config.FETCH_CHUNK_SIZE))
+
+# Run a query through the shared pool, reusing fresh results
+# Callers get their own copy, so they can add columns freely
+def query(sql, params, columns):
+    result = result_cache.get_or_load(cache_key(sql, params), lambda: fetch(sql, params, columns))
+    return (result.copy())
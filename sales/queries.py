@@ -0,0 +1,111 @@
+import pandas as pd
+from sales import pinot, schema
+
+# Pinot table holding the sales transactions
+TABLE = 'SalesTxs'
+
+# Pinot returns only 10 groups when a GROUP BY has no LIMIT
+GROUP_LIMIT = 100000
+
+# Aggregations used by the dashboard pages
+# name: (group by columns, [(function, column, alias)])
+AGGREGATIONS = {
+    'kpis': ([], [
+        ('SUM', 'purchase_amount_usd', 'total_revenue'),
+        ('AVG', 'review_rating', 'avg_rating'),
+        ('COUNT', '*', 'total_customers'),
+    ]),
+    # Product page
+    'revenue_by_item': (['item_purchased'], [('SUM', 'purchase_amount_usd', 'purchase_amount_usd')]),
+    'revenue_by_category': (['category'], [('SUM', 'purchase_amount_usd', 'purchase_amount_usd')]),
+    'customers_revenue_by_category_item': (['category', 'item_purchased'], [
+        ('COUNT', '*', 'count_cust'),
+        ('SUM', 'purchase_amount_usd', 'sum_rev'),
+    ]),
+    # Sales page
+    'customers_by_size': (['size'], [('COUNT', '*', 'customer_id')]),
+    'customers_by_gender': (['gender'], [('COUNT', '*', 'customer_id')]),
+    'customers_by_promo_code': (['promo_code_used'], [('COUNT', '*', 'customer_id')]),
+    'customers_by_shipping_type': (['shipping_type'], [('COUNT', '*', 'customer_id')]),
+    'revenue_by_state': (['location'], [('SUM', 'purchase_amount_usd', 'purchase_amount_usd')]),
+    'customers_by_age': (['age'], [('COUNT', '*', 'customers')]),
+    # Insights page
+    'purchases_by_payment_method': (['payment_method'], [('COUNT', '*', 'purchases')]),
+    'revenue_by_season': (['season'], [('SUM', 'purchase_amount_usd', 'purchase_amount_usd')]),
+    'purchases_revenue_by_item': (['item_purchased'], [
+        ('COUNT', '*', 'purchases'),
+        ('SUM', 'purchase_amount_usd', 'purchase_amount_usd'),
+    ]),
+    'customers_by_age_payment_frequency': (['age', 'payment_method', 'frequency_of_purchases'], [
+        ('COUNT', '*', 'customers'),
+    ]),
+}
+
+def quote(column):
+    # Some column names (e.g. size) are reserved words in Pinot SQL
+    return column if column == '*' else f'"{column}"'
+
+def select_list(columns):
+    return (', '.join(quote(c) for c in columns))
+
+def aggregate_columns(name):
+    group_by, metrics = AGGREGATIONS[name]
+    return group_by + [alias for _, _, alias in metrics]
+
+# pandas types of the metrics, as Pinot returns them
+METRIC_TYPES = {'COUNT': 'int64', 'SUM': 'float64', 'AVG': 'float64'}
+
+# Result of an aggregation no row matches, typed like one that has rows so
+# the pages can sort, rank and chart it the same way
+def empty_result(name):
+    group_by, metrics = AGGREGATIONS[name]
+    empty_df = pd.DataFrame({column: pd.Series(dtype=object) for column in group_by})
+    for func, _, alias in metrics:
+        empty_df[alias] = pd.Series(dtype=METRIC_TYPES[func])
+    return (schema.apply(empty_df, group_by))
+
+# Build the WHERE clause for {column: [values]} filters
+# Returns None when a filter has nothing selected, as no row can match
+def build_where(filters):
+    clauses = []
+    params = {}
+    for column, values in sorted((filters or {}).items()):
+        # Sorted so the same selection always renders the same SQL
+        values = sorted(set(values))
+        if not values:
+            return None
+        names = []
+        for i, value in enumerate(values):
+            param = f'{column}_{i}'
+            params[param] = value
+            names.append(f'%({param})s')
+        clauses.append(f'{quote(column)} IN ({", ".join(names)})')
+    where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+    return where, params
+
+def aggregate_sql(name, filters=None):
+    group_by, metrics = AGGREGATIONS[name]
+    where = build_where(filters)
+    if where is None:
+        return None
+    where, params = where
+
+    select = [quote(c) for c in group_by]
+    select += [f'{func}({quote(column)}) AS {quote(alias)}' for func, column, alias in metrics]
+    sql = f'SELECT {", ".join(select)} FROM {TABLE} {where}'
+    if group_by:
+        sql += f' GROUP BY {", ".join(quote(c) for c in group_by)} LIMIT {GROUP_LIMIT}'
+    return sql, params
+
+# Run one aggregation through the shared connection pool and result cache
+def aggregate(name, filters=None):
+    columns = aggregate_columns(name)
+    query = aggregate_sql(name, filters)
+    if query is None:
+        return empty_result(name)
+    sql, params = query
+    group_by, _ = AGGREGATIONS[name]
+    result_df = pinot.query(sql, params, columns)
+    if result_df.empty:
+        return (empty_result(name))
+    return (schema.apply(result_df, group_by))
@@ -0,0 +1,72 @@
+import locale
+import pandas as pd
+
+# Typed layout of the SalesTxs columns in pandas, and the values the pages
+# offer and format, with no streamlit import so the benchmarks can share them
+
+# Values offered by the page selectors
+PRODUCT_ITEMS = ['Blouse', 'Jewelry', 'Pants', 'Shirt', 'Dress', 'Sweater',
+    'Jacket', 'Belt', 'Sunglasses', 'Coat', 'Sandals', 'Socks',
+    'Skirt', 'Shorts', 'Scarf', 'Hat', 'Handbag', 'Hoodie', 'Shoes',
+    'T-shirt', 'Sneakers', 'Boots', 'Backpack', 'Gloves', 'Jeans']
+PAY_METHODS = ['PayPal', 'Credit Card', 'Cash', 'Debit Card', 'Venmo', 'Bank Transfer']
+SEASONS = ['Spring', 'Summer', 'Fall', 'Winter']
+
+# Columns of the SalesTxs table, in the order SELECT * returns them
+SALES_COLUMNS = [
+    'age','category','color','customer_id','discount_applied','frequency_of_purchases',
+    'gender','item_purchased','location','payment_method','previous_purchases','promo_code_used',
+    'purchase_amount_usd','purchase_time','review_rating','season','shipping_type','size','subscription_status'
+]
+
+# Low-cardinality strings
+CATEGORY_COLUMNS = [
+    'category', 'color', 'frequency_of_purchases', 'gender', 'item_purchased',
+    'location', 'payment_method', 'season', 'shipping_type', 'size'
+]
+
+# Yes/No strings
+FLAG_COLUMNS = ['discount_applied', 'promo_code_used', 'subscription_status']
+FLAG_TRUE = ['Yes', 'yes', 'true', 'True', True]
+
+# Narrowest numeric types that hold the values
+NUMERIC_TYPES = {
+    'age': 'int8',
+    'customer_id': 'int32',
+    'previous_purchases': 'int16',
+    'purchase_amount_usd': 'float32',
+    'review_rating': 'float32',
+    'purchase_time': 'int64',
+}
+
+def convert(column, values):
+    if column in CATEGORY_COLUMNS:
+        return (values.astype('category'))
+    if column in FLAG_COLUMNS:
+        return (values.isin(FLAG_TRUE))
+    if column in NUMERIC_TYPES:
+        return (pd.to_numeric(values).astype(NUMERIC_TYPES[column]))
+    return (values)
+
+# Cast the given columns (all by default) to the schema types, in place
+def apply(df, columns=None):
+    for column in (columns if columns is not None else df.columns):
+        if column in df.columns:
+            df[column] = convert(column, df[column])
+    return (df)
+
+# Typed DataFrame from rows of a Pinot query
+def build_frame(rows, columns):
+    return (apply(pd.DataFrame(rows, columns=columns)))
+
+# Yes/No labels back for charts of the flag columns
+def flag_labels(values):
+    return (values.map({True: 'Yes', False: 'No'}))
+
+# Amount in the currency of the locale the pages set, plain dollars when
+# that locale is not installed
+def currency(amount):
+    try:
+        return (locale.currency(amount, symbol=True, grouping=True))
+    except ValueError:
+        return (f'${amount:,.2f}')
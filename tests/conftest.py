@@ -0,0 +1,83 @@
+import itertools
+import json
+import re
+import sqlite3
+import pytest
+from sales import pinot
+from sales.embedded import COLUMN_TYPES
+from sales.schema import SALES_COLUMNS
+
+BATCH_FILE = './data/shopping_trends_updated_batch.json'
+
+# pinotdb cursor over an in-memory SQLite SalesTxs table: same parameter
+# style, %(name)s, and the same DB-API calls the query layer makes. Every
+# statement run is kept in queries
+class FakePinotCursor():
+
+    def __init__(self, conn, queries):
+        self.conn = conn
+        self.queries = queries
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.queries.append((sql, params))
+        self.curs = self.conn.execute(re.sub(r'%\((\w+)\)s', r':\1', sql), params or {})
+        self.description = self.curs.description
+
+    def fetchall(self):
+        return (self.curs.fetchall())
+
+    def fetchmany(self, size):
+        return (self.curs.fetchmany(size))
+
+# pinotdb connection: each one opens its own handle on the shared database,
+# as the pool may use several from different threads
+class FakePinotConnection():
+
+    def __init__(self, uri, queries):
+        self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self.conn.create_function('MOD', 2, lambda a, b: a % b)
+        self.queries = queries
+
+    def cursor(self):
+        return (FakePinotCursor(self.conn, self.queries))
+
+    def close(self):
+        self.conn.close()
+
+# SalesTxs with the column types of the Pinot table, so SUM and AVG come
+# back as doubles as they do from the broker
+class FakeBroker():
+
+    names = itertools.count()
+
+    def __init__(self, rows):
+        self.uri = f'file:salestxs{next(self.names)}?mode=memory&cache=shared'
+        self.queries = []
+        # Keeps the shared in-memory database alive
+        self.conn = sqlite3.connect(self.uri, uri=True)
+        columns = ', '.join(f'"{c}" {COLUMN_TYPES.get(c, "TEXT")}' for c in SALES_COLUMNS)
+        self.conn.execute(f'CREATE TABLE SalesTxs ({columns})')
+        with self.conn:
+            self.conn.executemany(
+                f'INSERT INTO SalesTxs VALUES ({", ".join("?" * len(SALES_COLUMNS))})',
+                [[row.get(c, 0 if c == 'purchase_time' else None) for c in SALES_COLUMNS] for row in rows])
+
+    def connect(self, **connect_args):
+        return (FakePinotConnection(self.uri, self.queries))
+
+@pytest.fixture(scope='session')
+def batch_rows():
+    with open(BATCH_FILE) as f:
+        return ([json.loads(line) for line in f if line.strip()])
+
+# The query layer wired to a fake broker through pinot.connect, with its own
+# pool and an empty result cache
+@pytest.fixture
+def broker(monkeypatch, batch_rows):
+    fake = FakeBroker(batch_rows)
+    monkeypatch.setattr(pinot, 'connect', fake.connect)
+    monkeypatch.setattr(pinot, 'pool', pinot.ConnectionPool(4))
+    monkeypatch.setattr(pinot, 'result_cache', pinot.ResultCache(60, 128))
+    yield (fake)
+    fake.conn.close()
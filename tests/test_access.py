@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+from sales import access, config, queries
+from tests.test_queries import sorted_rows
+
+SELECTIONS = [
+    {},
+    {'item_purchased': ['Blouse', 'Jewelry', 'Pants']},
+    {'payment_method': ['Cash', 'Venmo'], 'season': ['Fall', 'Winter']},
+    {'season': []},
+]
+
+# Every source in the page's modes, answering from what it loaded; a sample
+# larger than the table holds every row, so it is exact as well
+SOURCES = {
+    'exact': lambda: access.ExactAggregates(),
+    'sample': lambda: access.SampledAggregates(100000),
+    'paged': lambda: access.PagedAggregates(500),
+}
+
+@pytest.mark.parametrize('mode', list(SOURCES))
+def test_sources_match_the_broker(broker, mode):
+    source = SOURCES[mode]()
+    for name, (group_by, _) in queries.AGGREGATIONS.items():
+        for filters in SELECTIONS:
+            result_df = sorted_rows(source.aggregate(name, filters), group_by)
+            broker_df = sorted_rows(queries.aggregate(name, filters), group_by)
+            # Sampled counts are scaled up to the table, estimates as floats
+            pd.testing.assert_frame_equal(result_df, broker_df, check_dtype=(mode != 'sample'))
+
+def test_exact_reloads_only_when_stale(broker):
+    source = access.ExactAggregates()
+    version = source.version()
+    fetched = len(broker.queries)
+    assert source.version() == version and len(broker.queries) == fetched
+    source.invalidate()
+    assert source.version() != version
+
+def test_one_sample_per_allowed_size(broker, monkeypatch):
+    monkeypatch.setattr(access, 'samples', {})
+    for size in [10000, 12345, 10000, 5, 99999999]:
+        access.source('sample', size)
+    assert sorted(access.samples) == [min(config.SAMPLE_SIZES), 10000, max(config.SAMPLE_SIZES)]
+    assert access.source('sample', 10000) is access.samples[10000]
@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip('llama_index')
+
+from chat import memory
+
+def test_messages_are_not_mutated(monkeypatch):
+    monkeypatch.setattr(memory, 'MAX_MESSAGES', 5)
+    monkeypatch.setattr(memory, 'VISIBLE_MESSAGES', 2)
+    messages = [{'role': 'user', 'content': str(n)} for n in range(8)]
+    kept = memory.trim_messages(messages)
+    assert len(messages) == 8
+    assert kept == messages[-5:]
+    older, recent = memory.split_messages(kept)
+    assert (older, recent) == (messages[3:6], messages[6:])
+    assert len(kept) == 5
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+from sales import queries, schema
+
+def test_where_without_filters():
+    assert queries.build_where(None) == ('', {})
+    assert queries.build_where({}) == ('', {})
+
+def test_where_is_sorted_and_deduplicated():
+    where, params = queries.build_where({'season': ['Winter', 'Fall', 'Winter'], 'gender': ['Male']})
+    assert where == 'WHERE "gender" IN (%(gender_0)s) AND "season" IN (%(season_0)s, %(season_1)s)'
+    assert params == {'gender_0': 'Male', 'season_0': 'Fall', 'season_1': 'Winter'}
+
+def test_where_of_an_empty_selection():
+    assert queries.build_where({'item_purchased': []}) is None
+    assert queries.build_where({'season': ['Fall'], 'payment_method': []}) is None
+
+def test_sql_of_a_grouped_aggregation():
+    sql, params = queries.aggregate_sql('customers_by_size', {'item_purchased': ['Hat']})
+    assert sql == ('SELECT "size", COUNT(*) AS "customer_id" FROM SalesTxs '
+        'WHERE "item_purchased" IN (%(item_purchased_0)s) GROUP BY "size" LIMIT 100000')
+    assert params == {'item_purchased_0': 'Hat'}
+
+def test_sql_of_kpis_has_no_group_by():
+    sql, params = queries.aggregate_sql('kpis')
+    assert 'GROUP BY' not in sql and 'LIMIT' not in sql
+    assert params == {}
+
+def test_sql_of_an_empty_selection():
+    assert queries.aggregate_sql('revenue_by_item', {'item_purchased': []}) is None
+
+# What the broker should return for an aggregation, computed by pandas on the
+# same rows and typed as queries.aggregate types results
+def expected(rows, name, filters):
+    group_by, metrics = queries.AGGREGATIONS[name]
+    rows_df = pd.DataFrame(rows)
+    for column, values in filters.items():
+        rows_df = rows_df[rows_df[column].isin(values)]
+    how = {'COUNT': 'size', 'SUM': 'sum', 'AVG': 'mean'}
+    if group_by:
+        expected_df = pd.DataFrame({
+            alias: rows_df.groupby(group_by)[column if column != '*' else 'customer_id'].agg(how[func])
+            for func, column, alias in metrics}).reset_index()
+    else:
+        expected_df = pd.DataFrame([{
+            alias: rows_df[column if column != '*' else 'customer_id'].agg(how[func])
+            for func, column, alias in metrics}])
+    for func, _, alias in metrics:
+        expected_df[alias] = expected_df[alias].astype(queries.METRIC_TYPES[func])
+    return (sorted_rows(schema.apply(expected_df, group_by), group_by))
+
+def sorted_rows(result_df, group_by):
+    if group_by:
+        result_df = result_df.sort_values(group_by)
+    return (result_df.reset_index(drop=True))
+
+FILTERS = {'item_purchased': ['Blouse', 'Jewelry', 'Pants']}
+
+@pytest.mark.parametrize('name', list(queries.AGGREGATIONS))
+def test_aggregations_match_pandas(broker, batch_rows, name):
+    group_by, _ = queries.AGGREGATIONS[name]
+    result_df = sorted_rows(queries.aggregate(name, FILTERS), group_by)
+    pd.testing.assert_frame_equal(result_df, expected(batch_rows, name, FILTERS))
+
+def test_results_are_cached(broker):
+    queries.aggregate('revenue_by_item', FILTERS)
+    queries.aggregate('revenue_by_item', {'item_purchased': list(reversed(FILTERS['item_purchased']))})
+    assert len(broker.queries) == 1
+
+def test_no_matching_rows_is_typed(broker):
+    result_df = queries.aggregate('revenue_by_category', {'item_purchased': ['Umbrella']})
+    pd.testing.assert_frame_equal(result_df, queries.empty_result('revenue_by_category'))
+
+@pytest.mark.parametrize('name', list(queries.AGGREGATIONS))
+def test_empty_selection_is_typed_and_not_queried(broker, name):
+    result_df = queries.aggregate(name, {'item_purchased': []})
+    assert broker.queries == []
+    assert result_df.empty
+    assert list(result_df.columns) == queries.aggregate_columns(name)
+    for func, _, alias in queries.AGGREGATIONS[name][1]:
+        assert str(result_df[alias].dtype) == queries.METRIC_TYPES[func]
+    # What the product page does with it
+    result_df.nlargest(100, result_df.columns[-1])
@@ -0,0 +1,99 @@
+# StreamingChatEngine over a real async HTTP client: the OpenAI LLM and
+# embedding of llama_index keep one httpx.AsyncClient between calls, so
+# every turn has to run on the loop its connections were opened on
+# Run from the repository root: python -m pytest tests
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+pytest.importorskip('llama_index')
+httpx = pytest.importorskip('httpx')
+
+from llama_index import ServiceContext
+from llama_index.llms import MockLLM
+from chat.embeddings import HashingEmbedding
+from chat.answer_cache import AnswerCache
+from chat.streaming import NO_CONTENT, StreamingChatEngine
+
+# Keep-alive server, so the client pools its connection between turns
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield (f'http://127.0.0.1:{server.server_address[1]}/')
+    server.shutdown()
+    server.server_close()
+
+# LLM and retriever sharing one client, as OpenAI and OpenAIEmbedding do
+class RemoteLLM():
+
+    def __init__(self, client, url):
+        self.client = client
+        self.url = url
+
+    async def apredict(self, prompt, **kwargs):
+        await self.client.get(self.url)
+        return (f"{kwargs['question']} (condensed)")
+
+class RemoteRetriever():
+
+    def __init__(self, client, url):
+        self.client = client
+        self.url = url
+        self.questions = []
+
+    async def aretrieve(self, question):
+        await self.client.get(self.url)
+        self.questions.append(question)
+        return ([])
+
+class EmptyRetriever():
+
+    async def aretrieve(self, question):
+        return ([])
+
+class Index():
+
+    def __init__(self, retriever):
+        self.service_context = ServiceContext.from_defaults(llm=MockLLM(), embed_model=HashingEmbedding())
+        self.retriever = retriever
+
+    def as_retriever(self, similarity_top_k):
+        return (self.retriever)
+
+def test_turns_share_the_client(server_url):
+    client = httpx.AsyncClient()
+    retriever = RemoteRetriever(client, server_url)
+    engine = StreamingChatEngine(Index(retriever))
+    engine.llm = RemoteLLM(client, server_url)
+    question, cached, nodes = engine.prepare('Qual foi a receita?')
+    assert (question, cached, nodes) == ('Qual foi a receita?', None, [])
+    engine.memory.add_turn('Qual foi a receita?', 'R$ 37 bilhões.')
+    # Condensed with the history: a call to the LLM, then a second retrieval
+    question, cached, nodes = engine.prepare('E o lucro?')
+    assert question == 'E o lucro? (condensed)'
+    assert retriever.questions[-1] == 'E o lucro? (condensed)'
+    engine.loop.run_until_complete(client.aclose())
+
+def test_nothing_retrieved():
+    answer_cache = AnswerCache(HashingEmbedding())
+    engine = StreamingChatEngine(Index(EmptyRetriever()), answer_cache=answer_cache)
+    assert list(engine.stream_chat('Qual foi a receita?')) == [NO_CONTENT]
+    assert not engine.cache_hit and engine.total_seconds is not None
+    # Not an answer: neither cached nor part of the history
+    assert answer_cache.stats()['size'] == 0
+    assert not engine.memory